@@ -0,0 +1,194 @@
+"""
+流水线性能测试：用 synthetic_data 生成不同规模的输入，分别计时各处理步骤，
+并在新进程中测量主要模块的冷启动导入耗时；结果保存为 JSON 以便前后两次运行对比。
+
+用法：
+    python benchmark.py --rows 10000 100000 --skus 1000 --repeat 3
+    python benchmark.py --rows 100000 --compare benchmark_results/上次结果.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from io import BytesIO
+
+import pandas as pd
+
+from compact_dtypes import compact_tables
+from config import PIVOT_CONFIG, COLUMN_MAPPING
+from excel_utils import process_date_column
+from merge_sections import build_summary
+from pipeline import prepare_references, reference_tables
+from pivot_processor import create_pivot, add_historical_order_columns, parse_month
+from preprocessing import MappingIndex, apply_full_mapping, compile_mapping
+from report_writer import StreamingReportWriter
+from synthetic_data import generate_inputs
+
+RESULTS_DIR = "benchmark_results"
+ORDERS_FILE = "赛卓-未交订单.xlsx"
+
+# 冷启动：在新进程中导入这些模块的耗时，并检查是否带入了 streamlit / requests
+COLD_START_MODULES = ["pipeline", "report_cli", "github_utils", "main"]
+COLD_START_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start, "streamlit" in sys.modules, "requests" in sys.modules)
+"""
+
+
+def _time(func, repeat):
+    """运行 repeat 次，返回每次耗时（秒）与最后一次的结果。"""
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def run_case(n_rows, n_skus, repeat, cutoff_month, seed=0):
+    """对一个规模运行全部步骤，返回结果记录列表。"""
+    inputs = generate_inputs(n_rows, n_skus, seed)
+    mapping_index = compile_mapping(inputs["mapping_file.xlsx"])
+    records = []
+
+    def record(step, filename, timings, rows_in, rows_out, **extra):
+        """extra 为步骤特有的字段（如 write_excel 的输出字节数 bytes_out）。"""
+        records.append({
+            "step": step, "file": filename, "rows": n_rows, "skus": n_skus,
+            "rows_in": rows_in, "rows_out": rows_out,
+            "seconds_min": min(timings), "seconds_median": statistics.median(timings),
+            **extra,
+        })
+
+    # 直接构造 MappingIndex，绕过 compile_mapping 的按版本缓存
+    timings, _ = _time(lambda: MappingIndex(inputs["mapping_file.xlsx"]), repeat)
+    record("compile_mapping", "mapping_file.xlsx", timings, len(inputs["mapping_file.xlsx"]), len(mapping_index))
+
+    core = {filename: inputs[filename] for filename in PIVOT_CONFIG}
+    core.update(reference_tables(inputs["safety_file.xlsx"], inputs["pred_file.xlsx"]))
+    timings, (compacted, _) = _time(lambda: compact_tables(core, mapping_index), repeat)
+    record("compact_tables", None, timings, sum(len(df) for df in core.values()),
+           sum(len(df) for df in compacted.values()))
+
+    pivots = {}
+    for filename, config in PIVOT_CONFIG.items():
+        df = compacted[filename]
+        if filename in COLUMN_MAPPING:
+            cols = COLUMN_MAPPING[filename]
+            timings, df = _time(lambda: apply_full_mapping(
+                df, mapping_index, cols["规格"], cols["品名"], cols["晶圆品名"], value_cols=config["values"]
+            ), repeat)
+            record("apply_full_mapping", filename, timings, len(compacted[filename]), len(df))
+
+        if "date_format" in config:
+            timings, df = _time(lambda: process_date_column(df, config["columns"], config["date_format"]), repeat)
+            record("process_date_column", filename, timings, len(df), len(df))
+
+        timings, pivoted = _time(lambda: create_pivot(df, config, filename), repeat)
+        record("create_pivot", filename, timings, len(df), len(pivoted))
+        pivots[filename] = pivoted
+
+    orders = pivots[ORDERS_FILE]
+    timings, rolled = _time(
+        lambda: add_historical_order_columns(orders, PIVOT_CONFIG[ORDERS_FILE], cutoff_month), repeat
+    )
+    record("add_historical_order_columns", ORDERS_FILE, timings, len(orders), len(rolled))
+
+    pivots[ORDERS_FILE] = rolled
+    safety, pred = prepare_references(compacted, mapping_index)
+    timings, summary = _time(lambda: build_summary(pivots, safety, pred), repeat)
+    record("build_summary", None, timings, sum(len(p) for p in pivots.values()), len(summary.frame))
+
+    def write_report():
+        buffer = BytesIO()
+        writer = StreamingReportWriter(buffer)
+        writer.write_sheet("汇总", summary.frame, header_groups=summary.header_groups, border=True)
+        for filename, pivoted in pivots.items():
+            writer.write_sheet(filename.replace(".xlsx", "")[:30], pivoted)
+        writer.save()
+        return buffer
+
+    timings, buffer = _time(write_report, repeat)
+    rows_written = len(summary.frame) + sum(len(p) for p in pivots.values())
+    record("write_excel", None, timings, rows_written, rows_written, bytes_out=buffer.getbuffer().nbytes)
+    return records
+
+
+def measure_cold_start(repeat, modules=COLD_START_MODULES):
+    """每个模块在 repeat 个新的 Python 进程中分别导入计时。"""
+    records = []
+    for module in modules:
+        timings = []
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, "-c", COLD_START_SCRIPT.format(module=module)],
+                capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout.split()
+            timings.append(float(output[0]))
+        records.append({
+            "step": "cold_import", "file": module, "rows": None, "skus": None,
+            "streamlit": output[1] == "True", "requests": output[2] == "True",
+            "seconds_min": min(timings), "seconds_median": statistics.median(timings),
+        })
+    return records
+
+
+def compare(current, previous):
+    """按 (步骤, 文件, 规模) 对比两次结果，返回含 ratio（本次/上次）的 DataFrame。"""
+    keys = ["step", "file", "rows", "skus"]
+    cur = pd.DataFrame(current["results"])
+    prev = pd.DataFrame(previous["results"])[keys + ["seconds_min"]]
+    merged = cur.merge(prev, on=keys, how="left", suffixes=("", "_previous"))
+    merged["ratio"] = merged["seconds_min"] / merged["seconds_min_previous"]
+    return merged[keys + ["seconds_min_previous", "seconds_min", "ratio"]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="汇总报告流水线性能测试")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000], help="每个核心文件的行数，可给多个")
+    parser.add_argument("--skus", type=int, nargs="+", default=[1_000], help="料号数量，可给多个")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--month", default="2025-06", type=parse_month, help="add_historical_order_columns 使用的截至月份")
+    parser.add_argument("--output", help=f"结果 JSON 路径，默认写入 {RESULTS_DIR}/")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    parser.add_argument("--skip-cold-start", action="store_true", help="不测量模块冷启动导入耗时")
+    args = parser.parse_args(argv)
+
+    results = [] if args.skip_cold_start else measure_cold_start(args.repeat)
+    for n_rows in args.rows:
+        for n_skus in args.skus:
+            results += run_case(n_rows, n_skus, args.repeat, args.month)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    with pd.option_context("display.width", 200, "display.max_rows", None):
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as f:
+                print(compare(report, json.load(f)).to_string(index=False))
+        else:
+            print(pd.DataFrame(results).to_string(index=False))
+    print(f"结果已保存到 {output}")
+
+
+if __name__ == '__main__':
+    main()
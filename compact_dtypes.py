@@ -0,0 +1,84 @@
+"""
+读取后的紧凑类型转换：数量列降位为最小的整数类型，料号等键列转为共享同一字典的 Categorical。
+
+所有文件（核心文件与安全库存、预测等参考文件）的键列共用一个按字典序排列的类别表，因此：
+- 替换料号、透视分组与汇总表的连接（见 merge_sections._lookup）都比较整数编码而不是 Python 字符串；
+- 分组按编码排序即按字符串排序，透视结果的行顺序与 object 列时一致。
+键列中混有数字等非字符串值时保持原样（无法与字符串一起排序）。
+"""
+import numpy as np
+import pandas as pd
+
+from config import PIVOT_CONFIG, COLUMN_MAPPING
+
+# 参考文件中参与汇总的数量列
+REFERENCE_VALUE_COLUMNS = {"safety_file.xlsx": [' InvWaf', ' InvPart']}
+
+
+def key_columns(filename):
+    """文件中作为键的列：透视 index 与 COLUMN_MAPPING 中的料号列。"""
+    cols = list(PIVOT_CONFIG.get(filename, {}).get('index', []))
+    cols += list(COLUMN_MAPPING.get(filename, {}).values())
+    return list(dict.fromkeys(cols))
+
+
+def value_columns(filename):
+    return list(PIVOT_CONFIG.get(filename, {}).get('values', [])) + REFERENCE_VALUE_COLUMNS.get(filename, [])
+
+
+def downcast_numeric(series):
+    """
+    整数列降为最小整数类型；没有缺失且全为整数值的浮点/数字文本列同样转为整数。
+    含小数或缺失的列为 float64（金额不宜降为 float32）；含非数字文本的列保持原样。
+    """
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+
+    numeric = series if pd.api.types.is_float_dtype(series) else pd.to_numeric(series, errors='coerce')
+    if numeric.isna().sum() != series.isna().sum():
+        return series
+    values = numeric.to_numpy(dtype='float64')
+    if np.isnan(values).any() or not np.array_equal(values, np.trunc(values)) \
+            or (len(values) and np.abs(values).max() >= 2 ** 53):
+        return numeric.astype('float64')
+    return pd.to_numeric(numeric.astype('int64'), downcast='integer')
+
+
+def _is_string_column(series):
+    return isinstance(series.dtype, pd.CategoricalDtype) \
+        or pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty')
+
+
+def build_key_dtype(tables, extra_values=()):
+    """由所有文件键列中的字符串值（及 extra_values）构建共享的 CategoricalDtype。"""
+    parts = [[v for v in extra_values if isinstance(v, str)]]
+    for filename, df in tables.items():
+        for col in key_columns(filename):
+            if col in df.columns and _is_string_column(df[col]):
+                parts.append(df[col].dropna().unique())
+    categories = pd.Index(np.concatenate([np.asarray(p, dtype=object) for p in parts]), dtype=object)
+    return pd.CategoricalDtype(categories.unique().sort_values())
+
+
+def compact_frame(df, filename, key_dtype):
+    """返回转换后的新 DataFrame（只替换被转换的列，不复制其余列）。"""
+    changes = {}
+    for col in key_columns(filename):
+        if col in df.columns and _is_string_column(df[col]) and df[col].dtype != key_dtype:
+            changes[col] = df[col].astype(key_dtype)
+    for col in value_columns(filename):
+        if col in df.columns:
+            changes[col] = downcast_numeric(df[col])
+    return df.assign(**changes) if changes else df
+
+
+def compact_tables(tables, mapping_index=None):
+    """
+    转换全部文件，返回 ({文件名: DataFrame}, 共享 CategoricalDtype)。
+    传入 mapping_index 时新料号也加入类别表，替换后仍能保持 Categorical 编码。
+    """
+    extra = () if mapping_index is None else mapping_index.new_key_values()
+    key_dtype = build_key_dtype(tables, extra)
+    return {name: compact_frame(df, name, key_dtype) for name, df in tables.items()}, key_dtype
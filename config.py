@@ -4,14 +4,27 @@ from datetime import datetime
 GITHUB_TOKEN_KEY = "GITHUB_TOKEN"  # 用于 st.secrets 获取
 REPO_NAME = "TTTriste06/semiment"
 BRANCH = "main"
+GITHUB_API_URL = "https://api.github.com"
+
+# 参考文件本地缓存
+CACHE_DIR = ".cache/reference_files"
+CACHE_MAX_BYTES = 200 * 1024 * 1024  # 超出后按 LRU 淘汰
+CACHE_MAX_AGE = 60  # 秒；在此时间内不再向 GitHub 重新验证
+
+# 按月份保存的 Parquet 快照目录（见 snapshot_store）
+SNAPSHOT_DIR = "snapshots"
+
+# 超过该大小的核心文件改为流式读取并按块预聚合（见 streaming_reader）
+STREAM_MIN_BYTES = 20 * 1024 * 1024
+
+# 输出文件名：每次生成报告时调用，时间戳取生成时刻
+OUTPUT_FILE_PREFIX = "运营数据订单-在制-库存汇总报告"
 
-# 选择月份
-CONFIG = {
-    "selected_month": None
-}
 
-# 默认输出文件名
-OUTPUT_FILE = f"运营数据订单-在制-库存汇总报告_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+def output_filename(month=None, extension="xlsx"):
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    suffix = f"{month}_{timestamp}" if month else timestamp
+    return f"{OUTPUT_FILE_PREFIX}_{suffix}.{extension}"
 
 # Excel 文件透视表配置
 PIVOT_CONFIG = {
@@ -1,36 +1,78 @@
-from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Alignment, Border, Side, PatternFill
 
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+# Excel 日期序列号的有效范围：1900-01-01 ~ 9999-12-31
+MIN_EXCEL_SERIAL = 1
+MAX_EXCEL_SERIAL = 2958465
+
+
+# 列宽估算最多取样的行数，超出时等间隔取样
+WIDTH_SAMPLE_ROWS = 5000
+MAX_COLUMN_WIDTH = 50
+
+
+def display_width(text):
+    """
+    字符串 Series 的显示宽度（向量化）：非 ASCII 字符（中文等）按 2 计，其余按 1 计。
+    """
+    return text.str.len() + text.str.count(r'[^\x00-\x7f]')
+
+
+def _max_display_width(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # 只需计算出现过的类别，每个类别只算一次
+        codes = series.cat.codes.to_numpy()
+        text = pd.Series(series.cat.categories[np.unique(codes[codes >= 0])].astype(str))
+    else:
+        text = series.dropna().astype(str)
+    return int(display_width(text).max()) if len(text) else 0
+
+
+def _sample_rows(df, sample_rows):
+    if sample_rows is None or len(df) <= sample_rows:
+        return df
+    return df.iloc[np.linspace(0, len(df) - 1, sample_rows).astype(int)]
+
+
+def compute_column_widths(df, sample_rows=WIDTH_SAMPLE_ROWS, include_header=True):
+    """
+    根据 DataFrame 内容估算每列的列宽，写入前即可确定（上限 50）。
+    中文按双倍宽度计算；行数超过 sample_rows 时只对等间隔取样的行估算。
+    """
+    sample = _sample_rows(df, sample_rows)
+    widths = []
+    for i, col in enumerate(df.columns):
+        width = _max_display_width(sample.iloc[:, i])
+        if include_header:
+            width = max(width, int(display_width(pd.Series([str(col)])).iloc[0]))
+        widths.append(min(width * 1.2 + 5, MAX_COLUMN_WIDTH))
+    return widths
+
+
+def compute_sheet_widths(frames, sample_rows=WIDTH_SAMPLE_ROWS):
+    """一次计算多个 sheet 的列宽：{sheet 名: DataFrame} → {sheet 名: 列宽列表}。"""
+    return {name: compute_column_widths(df, sample_rows) for name, df in frames.items()}
+
 
 def adjust_column_width(writer, sheet_name, df):
     """
     自动调整指定 sheet 的列宽（适用于 openpyxl）。
     """
     worksheet = writer.sheets[sheet_name]
-    for idx, col in enumerate(df.columns, 1):
-        max_len = df[col].astype(str).str.len().max()
-        header_len = len(str(col))
-        width = max(max_len, header_len) * 1.2 + 5
-        worksheet.column_dimensions[get_column_letter(idx)].width = min(width, 50)
+    for idx, width in enumerate(compute_column_widths(df), 1):
+        worksheet.column_dimensions[get_column_letter(idx)].width = width
 
 
 def auto_adjust_column_width_by_worksheet(ws):
     """
-    自动根据 worksheet 的内容调整所有列宽（用于已写入的 worksheet）。
+    自动根据 worksheet 的内容调整所有列宽（用于已写入的 worksheet），与 compute_column_widths 同一算法。
     """
-    for idx, col in enumerate(ws.columns, 1):
-        col_letter = get_column_letter(idx)
-        max_length = 0
-        for cell in col:
-            try:
-                if cell.value:
-                    cell_len = sum(2 if ord(char) > 127 else 1 for char in str(cell.value))
-                    max_length = max(max_length, cell_len)
-            except Exception:
-                pass
-        ws.column_dimensions[col_letter].width = max_length + 5
+    df = pd.DataFrame(list(ws.values))
+    for idx, width in enumerate(compute_column_widths(df, include_header=False), 1):
+        ws.column_dimensions[get_column_letter(idx)].width = width
 
 
 def add_black_border(ws, row_count, col_count):
@@ -44,14 +86,63 @@ def add_black_border(ws, row_count, col_count):
             cell.border = border
 
 
+def _parse_date_strings(values):
+    """
+    解析字符串/日期对象：相同取值只解析一次（订单表中日期大量重复）。
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), errors='coerce', format='mixed')
+    parsed = parsed.astype('datetime64[ns]').to_numpy()
+    result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[ns]')
+    valid = codes >= 0
+    result[valid] = parsed[codes[valid]]
+    return result
+
+
+def _serials_to_dates(values):
+    """Excel 日期序列号 → datetime64；超出有效范围的值为 NaT（避免 timedelta 溢出回绕）。"""
+    values = np.asarray(values, dtype='float64')
+    values = np.where((values >= MIN_EXCEL_SERIAL) & (values <= MAX_EXCEL_SERIAL), values, np.nan)
+    return (EXCEL_EPOCH + pd.to_timedelta(values, unit='D')).to_numpy(dtype='datetime64[ns]', copy=True)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+
+
+def normalize_dates(series):
+    """
+    将 Excel 日期列统一转为 datetime64，全程向量化。
+    支持同一列中混合出现的日期序列号、日期字符串与 datetime 对象；无法解析的值为 NaT。
+    只有数字单元格按序列号处理，文本（包括 '20250301' 这样的纯数字文本）一律按日期字符串解析。
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype('datetime64[ns]')
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.Series(_serials_to_dates(series), index=series.index, name=series.name)
+
+    values = series.to_numpy(dtype=object)
+    numbers = np.fromiter((_is_number(v) for v in values), dtype=bool, count=len(values))
+    result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[ns]')
+    if numbers.any():
+        result[numbers] = _serials_to_dates(values[numbers])
+    rest = ~numbers & series.notna().to_numpy()
+    if rest.any():
+        result[rest] = _parse_date_strings(values[rest])
+    return pd.Series(result, index=series.index, name=series.name)
+
+
+def format_month_label(month, date_format="%Y-%m"):
+    """仅在生成最终列名时把月份 Period 格式化为字符串。"""
+    return month.strftime(date_format) if isinstance(month, pd.Period) else str(month)
+
+
 def process_date_column(df, date_col, date_format="%Y-%m"):
     """
     统一处理 Excel 中的日期列，支持日期序列/字符串 → datetime。
-    添加新列 {date_col}_年月。
+    添加新列 {date_col}_年月（月份 Period，按月比较与排序）；
+    date_format 只在生成透视列名时使用，见 format_month_label。
+    返回新的 DataFrame，不修改传入的 df。
     """
-    if pd.api.types.is_numeric_dtype(df[date_col]):
-        df[date_col] = df[date_col].apply(lambda x: datetime(1899, 12, 30) + timedelta(days=float(x)))
-    else:
-        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-    df[f'{date_col}_年月'] = df[date_col].dt.strftime(date_format)
-    return df
+    dates = normalize_dates(df[date_col])
+    return df.assign(**{date_col: dates, f'{date_col}_年月': dates.dt.to_period('M')})
@@ -0,0 +1,267 @@
+import base64
+import json
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from config import CACHE_DIR, CACHE_MAX_BYTES, CACHE_MAX_AGE
+
+# Parquet blob 的附加元数据：原列名（pickle）与按值编码的混合类型列
+COLUMNS_META = b"cache_columns"
+MIXED_META = b"cache_mixed_columns"
+# 混合类型 object 列中各值的类型标记；还原时按标记把字符串转回原类型
+MIXED_TYPES = {
+    str: (0, str),
+    int: (1, int),
+    float: (2, float),
+    bool: (3, lambda s: s == "True"),
+    datetime: (4, datetime.fromisoformat),
+    pd.Timestamp: (5, pd.Timestamp),
+    np.int64: (6, np.int64),
+    np.float64: (7, np.float64),
+}
+MIXED_DECODERS = {tag: decode for tag, decode in MIXED_TYPES.values()}
+
+
+def _encode_mixed(values):
+    """混合类型列转为 (字符串列, 类型标记列)；None 的标记为 -1，遇到无法还原的类型抛出 TypeError。"""
+    texts, tags = [], []
+    for v in values:
+        if v is None:
+            texts.append(None)
+            tags.append(-1)
+            continue
+        tag = MIXED_TYPES.get(type(v))
+        if tag is None:
+            raise TypeError(f"无法按值编码的类型: {type(v)}")
+        texts.append(str(v))
+        tags.append(tag[0])
+    return texts, tags
+
+
+def to_arrow_table(df):
+    """
+    转为可写入 Parquet 的 Arrow 表（与 snapshot_store.to_arrow 相同的思路，但可无损还原）：
+    - 列名按位置改为字符串，原列名（Excel 中的日期、数字表头）pickle 后存入元数据；
+    - Excel 读入的混合类型 object 列（如预测表中数字与表头文字混在一列）按值转为字符串，
+      另存一列类型标记，读回时逐值还原。
+    """
+    import pyarrow as pa
+
+    columns, mixed = {}, []
+    for i, col in enumerate(df.columns):
+        series = df.iloc[:, i]
+        if series.dtype == object:
+            try:
+                pa.array(series, from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                texts, tags = _encode_mixed(series)
+                columns[str(i)] = pd.Series(texts, dtype=object)
+                columns[f"{i}#type"] = pd.Series(tags, dtype="int8")
+                mixed.append(i)
+                continue
+        columns[str(i)] = series.reset_index(drop=True)
+    table = pa.Table.from_pandas(pd.DataFrame(columns), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[COLUMNS_META] = pickle.dumps(df.columns)
+    metadata[MIXED_META] = json.dumps(mixed).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def from_arrow_table(table):
+    """to_arrow_table 的逆过程；没有附加元数据（旧版本写入）的表直接转换。"""
+    metadata = table.schema.metadata or {}
+    df = table.to_pandas()
+    if COLUMNS_META not in metadata:
+        return df
+    for i in json.loads(metadata[MIXED_META]):
+        tags = df.pop(f"{i}#type").to_numpy()
+        df[str(i)] = [
+            None if tag < 0 else MIXED_DECODERS[tag](text)
+            for text, tag in zip(df[str(i)].to_numpy(dtype=object), tags)
+        ]
+    columns = pickle.loads(metadata[COLUMNS_META])
+    df = df[[str(i) for i in range(len(columns))]]
+    df.columns = columns
+    return df
+
+
+class ReferenceFileCache:
+    """
+    GitHub 参考文件的本地缓存：按 blob SHA 存储解析后的 DataFrame。
+    - 使用 ETag / If-None-Match 条件请求重新验证，未变化时只需一次 304；
+    - 在 max_age 秒内验证过的文件直接命中，不发请求；
+    - 总大小超过 max_bytes 时按最近使用时间（LRU）淘汰。
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE, session=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        if session is None:
+            import requests
+            session = requests.Session()
+        self.session = session
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    # ---------- 索引 ----------
+    def _index_path(self):
+        return os.path.join(self.cache_dir, self.INDEX_FILE)
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(tmp, self._index_path())
+
+    def invalidate(self, url):
+        """丢弃某个 URL 的验证状态（例如刚上传了新版本），blob 本身保留。"""
+        with self._lock:
+            if self._index.pop(url, None) is not None:
+                self._save_index()
+
+    # ---------- blob 存储 ----------
+    def _blob_path(self, sha):
+        for ext in (".parquet", ".pkl"):
+            path = os.path.join(self.cache_dir, sha + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _read_blob(self, sha):
+        path = self._blob_path(sha)
+        if path is None:
+            return None
+        try:
+            os.utime(path)  # 记录最近使用时间，供 LRU 淘汰
+            if path.endswith(".parquet"):
+                import pyarrow.parquet as pq
+                return from_arrow_table(pq.read_table(path))
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None  # 读取前被其它线程淘汰
+
+    def _write_blob(self, sha, df):
+        """
+        优先写 Parquet（混合类型列与非字符串表头见 to_arrow_table）；
+        含无法编码的值或未安装 pyarrow 时退回 pickle。
+        先写临时文件再改名，其它线程不会读到写了一半的 blob。
+        """
+        path = os.path.join(self.cache_dir, sha + ".parquet")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            import pyarrow.parquet as pq
+            pq.write_table(to_arrow_table(df), tmp)
+            os.replace(tmp, path)
+            return
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        path = os.path.join(self.cache_dir, sha + ".pkl")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def _evict(self, keep_sha):
+        """按最近使用时间淘汰旧 blob，直到总大小不超过 max_bytes（keep_sha 不淘汰）。"""
+        blobs = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith((".parquet", ".pkl")) and not name.startswith(keep_sha):
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                blobs.append((stat.st_mtime, stat.st_size, path))
+        kept = self._blob_path(keep_sha)
+        total = sum(size for _, size, _ in blobs) + (os.path.getsize(kept) if kept else 0)
+        for _, size, path in sorted(blobs):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    # ---------- 对外接口 ----------
+    def _url_lock(self, url):
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def fetch(self, url, headers=None):
+        """
+        通过 GitHub contents API 获取 Excel 文件并返回 DataFrame。
+        请求失败时抛出 requests.HTTPError。
+        同一 URL 的请求串行（避免重复下载），不同 URL 的下载与解析并行；
+        self._lock 只保护索引与 blob 淘汰，下载、解析与写 blob 都在锁外进行。
+        """
+        with self._url_lock(url):
+            with self._lock:
+                entry = dict(self._index[url]) if url in self._index else None
+            if entry and time.time() - entry["checked"] < self.max_age:
+                df = self._read_blob(entry["sha"])
+                if df is not None:
+                    return df
+
+            headers = dict(headers or {})
+            if entry and self._blob_path(entry["sha"]):
+                headers["If-None-Match"] = entry["etag"]
+
+            response = self.session.get(url, headers=headers)
+            if response.status_code == 304:
+                df = self._read_blob(entry["sha"])
+                if df is not None:
+                    self._update_index(url, dict(entry, checked=time.time()))
+                    return df
+                # 验证期间 blob 被淘汰：不带条件重新下载
+                headers.pop("If-None-Match")
+                response = self.session.get(url, headers=headers)
+            response.raise_for_status()
+
+            payload = response.json()
+            sha = payload["sha"]
+            df = self._read_blob(sha)
+            if df is None:
+                content = base64.b64decode(payload["content"])
+                df = pd.read_excel(BytesIO(content))
+                self._write_blob(sha, df)
+                with self._lock:
+                    self._evict(sha)
+
+            self._update_index(url, {
+                "sha": sha,
+                "etag": response.headers.get("ETag", ""),
+                "checked": time.time(),
+            })
+            return df
+
+    def _update_index(self, url, entry):
+        with self._lock:
+            self._index[url] = entry
+            self._save_index()
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """进程内共享的缓存实例（Streamlit 每次 rerun 复用）。"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ReferenceFileCache()
+    return _default_cache
@@ -1,46 +1,135 @@
-import requests
 import base64
-import streamlit as st
-import pandas as pd
+import hashlib
 from io import BytesIO
 
-from config import GITHUB_TOKEN_KEY, REPO_NAME, BRANCH
+from config import GITHUB_TOKEN_KEY, REPO_NAME, BRANCH, GITHUB_API_URL
 
 
-def upload_to_github(file, path_in_repo, commit_message):
+# requests 与 streamlit 在首次使用时才导入，导入本模块不会拖慢冷启动
+_session = None
+# st.session_state 中记录本会话已确认与远端一致的上传：{仓库路径: (上传控件 file_id, blob SHA)}
+UPLOAD_MEMO_KEY = "_github_uploaded"
+
+
+def get_session():
     """
-    上传文件到 GitHub 指定仓库与路径。
+    共享的 requests.Session：连接池复用，并对临时错误自动重试（指数退避）。
     """
-    api_url = f"https://api.github.com/repos/{REPO_NAME}/contents/{path_in_repo}"
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+        )
+        _session = requests.Session()
+        _session.mount("https://", HTTPAdapter(max_retries=retry, pool_maxsize=10))
+        _session.mount("http://", HTTPAdapter(max_retries=retry, pool_maxsize=10))
+    return _session
 
-    file.seek(0)
-    file_content = file.read()
-    encoded_content = base64.b64encode(file_content).decode('utf-8')
 
-    # 获取文件 SHA（如果已存在）
-    response = requests.get(api_url, headers={"Authorization": f"token {st.secrets[GITHUB_TOKEN_KEY]}"})
-    sha = response.json().get('sha') if response.status_code == 200 else None
+def git_blob_sha(content):
+    """计算与 git 一致的 blob SHA，用于和远端文件比较是否相同。"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
 
-    payload = {
-        "message": commit_message,
-        "content": encoded_content,
-        "branch": BRANCH
-    }
-    if sha:
-        payload["sha"] = sha
 
-    response = requests.put(api_url, json=payload, headers={"Authorization": f"token {st.secrets[GITHUB_TOKEN_KEY]}"})
+def _github_request(method, path, **kwargs):
+    import streamlit as st
+
+    headers = {"Authorization": f"token {st.secrets[GITHUB_TOKEN_KEY]}"}
+    response = get_session().request(method, f"{GITHUB_API_URL}/repos/{REPO_NAME}/{path}", headers=headers, **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+
+def upload_files_to_github(files, commit_message):
+    """
+    将多个文件合并为一次提交上传到 GitHub（git data API：blobs → tree → commit → ref）。
+    files 为 {仓库路径: 文件对象}；每次都读取远端最新的 tree，与远端 blob SHA 相同的文件会被跳过。
+    同一个上传控件文件（file_id 相同）在页面重跑时不再重复检查与提交；重新上传则重新比较。
+    返回实际上传的路径列表。
+    """
+    import requests
+    import streamlit as st
+
+    contents = {}
+    file_ids = {}
+    for path_in_repo, file in files.items():
+        file.seek(0)
+        contents[path_in_repo] = file.read()
+        file.seek(0)
+        file_ids[path_in_repo] = getattr(file, "file_id", None)
+
+    local_shas = {path: git_blob_sha(content) for path, content in contents.items()}
+    memo = st.session_state.setdefault(UPLOAD_MEMO_KEY, {})
+    pending = [
+        path for path in contents
+        if file_ids[path] is None or memo.get(path) != (file_ids[path], local_shas[path])
+    ]
+    if not pending:
+        return []
+
+    try:
+        head_sha = _github_request("GET", f"git/ref/heads/{BRANCH}")["object"]["sha"]
+        base_tree = _github_request("GET", f"git/commits/{head_sha}")["tree"]["sha"]
+        remote_tree = _github_request("GET", f"git/trees/{base_tree}", params={"recursive": "1"})["tree"]
+        remote_shas = {item["path"]: item["sha"] for item in remote_tree if item["type"] == "blob"}
+
+        changed = [path for path in pending if remote_shas.get(path) != local_shas[path]]
+        for path in pending:
+            if path not in changed and file_ids[path] is not None:
+                memo[path] = (file_ids[path], local_shas[path])
+        if not changed:
+            return []
+
+        tree_items = []
+        for path in changed:
+            blob = _github_request("POST", "git/blobs", json={
+                "content": base64.b64encode(contents[path]).decode('utf-8'),
+                "encoding": "base64"
+            })
+            tree_items.append({"path": path, "mode": "100644", "type": "blob", "sha": blob["sha"]})
+
+        tree_sha = _github_request("POST", "git/trees", json={"base_tree": base_tree, "tree": tree_items})["sha"]
+        commit_sha = _github_request("POST", "git/commits", json={
+            "message": commit_message,
+            "tree": tree_sha,
+            "parents": [head_sha]
+        })["sha"]
+        _github_request("PATCH", f"git/refs/heads/{BRANCH}", json={"sha": commit_sha})
+    except requests.RequestException as e:
+        st.error(f"上传失败: {e}")
+        return []
+
+    from file_cache import get_default_cache
+
+    cache = get_default_cache()
+    for path in changed:
+        if file_ids[path] is not None:
+            memo[path] = (file_ids[path], local_shas[path])
+        cache.invalidate(f"{GITHUB_API_URL}/repos/{REPO_NAME}/contents/{path}")
+    st.success(f"{', '.join(changed)} 上传成功！")
+    return changed
+
 
-    if response.status_code in [200, 201]:
-        st.success(f"{path_in_repo} 上传成功！")
-    else:
-        st.error(f"上传失败: {response.json()}")
+def upload_to_github(file, path_in_repo, commit_message):
+    """
+    上传文件到 GitHub 指定仓库与路径；内容与远端相同时跳过。
+    """
+    return upload_files_to_github({path_in_repo: file}, commit_message)
 
 
 def download_excel_from_url(url, token=None):
     """
     从公开或私有的 raw URL 下载 Excel 文件。
     """
+    import pandas as pd
+    import requests
+
     headers = {"Authorization": f"token {token}"} if token else {}
     response = requests.get(url, headers=headers)
 
@@ -49,22 +138,32 @@ def download_excel_from_url(url, token=None):
 
     return pd.read_excel(BytesIO(response.content))
 
+def fetch_excel_from_repo(filename, token):
+    """
+    从 GitHub 仓库读取 Excel 文件（经本地缓存），失败时抛出异常。
+    不调用 Streamlit，可在线程池中使用。
+    """
+    from file_cache import get_default_cache
+
+    api_url = f"{GITHUB_API_URL}/repos/{REPO_NAME}/contents/{filename}"
+    return get_default_cache().fetch(api_url, headers={"Authorization": f"token {token}"})
+
+
 def download_excel_from_repo(filename, show_warning=True):
     """
     从 GitHub 仓库中下载 Excel 文件（支持私有 repo），使用 GitHub API。
+    结果按 blob SHA 缓存在本地，未变化的文件只需一次 304 条件请求。
     """
-    api_url = f"https://api.github.com/repos/{REPO_NAME}/contents/{filename}"
-    headers = {"Authorization": f"token {st.secrets[GITHUB_TOKEN_KEY]}"}
-    response = requests.get(api_url, headers=headers)
+    import pandas as pd
+    import requests
+    import streamlit as st
 
-    if response.status_code != 200:
+    try:
+        df = fetch_excel_from_repo(filename, st.secrets[GITHUB_TOKEN_KEY])
+    except requests.HTTPError as e:
         if show_warning:
-            st.warning(f"⚠️ 无法下载 {filename}，返回码 {response.status_code}")
+            st.warning(f"⚠️ 无法下载 {filename}，返回码 {e.response.status_code}")
         return pd.DataFrame()
-
-    try:
-        content = base64.b64decode(response.json()['content'])
-        df = pd.read_excel(BytesIO(content))
     except Exception as e:
         if show_warning:
             st.warning(f"⚠️ 解析 {filename} 失败：{e}")
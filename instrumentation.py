@@ -0,0 +1,101 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class StageRecord:
+    """单个阶段的一次执行记录。"""
+
+    __slots__ = ("stage", "file", "seconds", "rows_in", "rows_out", "peak_mb")
+
+    def __init__(self, stage, file=None, rows_in=None):
+        self.stage = stage
+        self.file = file
+        self.seconds = None
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.peak_mb = None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Profiler:
+    """
+    轻量的分阶段统计：记录每个阶段、每个输入文件的耗时、输入/输出行数与峰值内存（tracemalloc）。
+    用法：
+        with profiler.stage("pivot", file=filename, rows_in=len(df)) as record:
+            pivoted = ...
+            record.rows_out = len(pivoted)
+    track_memory 会显著拖慢 pandas 运算，只在需要内存数据时开启。
+    """
+
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        self.records = []
+
+    @contextmanager
+    def stage(self, stage, file=None, rows_in=None):
+        record = StageRecord(stage, file, rows_in)
+        started_tracing = False
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = round(time.perf_counter() - start, 6)
+            if self.track_memory:
+                record.peak_mb = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 3)
+                if started_tracing:
+                    tracemalloc.stop()
+            self.records.append(record)
+
+    def add(self, stage, file=None, seconds=None, rows_out=None, peak_mb=None):
+        """记录在别处（线程池/进程池）测得的阶段耗时与峰值内存。"""
+        record = StageRecord(stage, file)
+        record.seconds = seconds
+        record.rows_out = rows_out
+        record.peak_mb = peak_mb
+        self.records.append(record)
+        return record
+
+    def extend(self, records, label=None):
+        """
+        追加其它进程中记录的 to_dicts() 结果；label（如月份）会加在文件名前，便于区分来源。
+        """
+        for data in records:
+            record = StageRecord(data["stage"], data["file"], data["rows_in"])
+            for name in ("seconds", "rows_out", "peak_mb"):
+                setattr(record, name, data[name])
+            if label is not None:
+                record.file = f"{label}/{record.file}" if record.file else str(label)
+            self.records.append(record)
+
+    def to_dicts(self):
+        return [record.to_dict() for record in self.records]
+
+    def to_json(self, **kwargs):
+        return json.dumps({"stages": self.to_dicts()}, ensure_ascii=False, **kwargs)
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame(self.to_dicts(), columns=list(StageRecord.__slots__))
+
+
+class NullProfiler(Profiler):
+    """不记录任何数据的默认实现。"""
+
+    @contextmanager
+    def stage(self, stage, file=None, rows_in=None):
+        yield StageRecord(stage, file, rows_in)
+
+    def add(self, stage, file=None, seconds=None, rows_out=None, peak_mb=None):
+        return StageRecord(stage, file)
+
+    def extend(self, records, label=None):
+        pass
@@ -0,0 +1,86 @@
+import os
+import time
+import tracemalloc
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from io import BytesIO
+
+import pandas as pd
+
+from config import PIVOT_CONFIG, STREAM_MIN_BYTES
+
+# 单个文件的加载结果：成功时 error 为 None，失败时 df 为 None；seconds 为工作线程/进程内的耗时，
+# peak_mb 为子进程内解析时的 tracemalloc 峰值（未开启内存统计或在线程中执行时为 None）
+LoadResult = namedtuple("LoadResult", ["name", "df", "error", "seconds", "peak_mb"])
+
+
+def _parse_excel(data):
+    """在子进程中解析 Excel 字节内容（openpyxl 解析是 CPU 密集型）。"""
+    return pd.read_excel(BytesIO(data))
+
+
+def _stream_excel(data, name):
+    """在子进程中流式读取大文件并预聚合，见 streaming_reader.read_aggregated。"""
+    from streaming_reader import read_aggregated
+    return read_aggregated(data, name)
+
+
+def should_stream(name, data, stream_min_bytes=STREAM_MIN_BYTES):
+    return name in PIVOT_CONFIG and stream_min_bytes is not None and len(data) >= stream_min_bytes
+
+
+def _timed(func, *args, track_memory=False):
+    """返回 (结果, 耗时, 峰值内存 MB)；track_memory 为 False 时峰值为 None。"""
+    started_tracing = track_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if track_memory:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+        seconds = time.perf_counter() - start
+        peak_mb = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 3) if track_memory else None
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+    return result, seconds, peak_mb
+
+
+def iter_load(parse_jobs=None, fetch_jobs=None, max_threads=8, max_processes=None,
+              stream_min_bytes=STREAM_MIN_BYTES, track_memory=False):
+    """
+    并发加载文件，按完成顺序逐个返回 LoadResult。
+    - parse_jobs: {名称: Excel 字节内容}，在进程池中解析；PIVOT_CONFIG 中不小于
+      stream_min_bytes 的文件改为流式读取并预聚合（为 None 时全部完整读取）；
+    - fetch_jobs: {名称: 无参函数}，在线程池中执行（网络下载等 IO 密集任务）。
+    track_memory 为 True 时在子进程内统计解析的峰值内存（线程共享进程内存，不统计下载任务）。
+    单个文件失败不会中断其它文件，异常放在 LoadResult.error 中返回。
+    """
+    parse_jobs = parse_jobs or {}
+    fetch_jobs = fetch_jobs or {}
+    max_processes = max_processes or min(len(parse_jobs), os.cpu_count() or 1) or 1
+
+    with ThreadPoolExecutor(max_workers=max_threads) as threads, \
+            ProcessPoolExecutor(max_workers=max_processes) as processes:
+        futures = {}
+        for name, func in fetch_jobs.items():
+            futures[threads.submit(_timed, func)] = name
+        for name, data in parse_jobs.items():
+            if should_stream(name, data, stream_min_bytes):
+                futures[processes.submit(_timed, _stream_excel, data, name, track_memory=track_memory)] = name
+            else:
+                futures[processes.submit(_timed, _parse_excel, data, track_memory=track_memory)] = name
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                df, seconds, peak_mb = future.result()
+                yield LoadResult(name, df, None, seconds, peak_mb)
+            except Exception as e:
+                yield LoadResult(name, None, e, None, None)
+
+
+def load_all(parse_jobs=None, fetch_jobs=None, **kwargs):
+    """等待全部文件加载完成，返回 {名称: LoadResult}。"""
+    return {result.name: result for result in iter_load(parse_jobs, fetch_jobs, **kwargs)}
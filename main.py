@@ -1,95 +1,131 @@
+from functools import partial
+from io import BytesIO
+
 import streamlit as st
-import pandas as pd
-from openpyxl import load_workbook
 
-from config import (
-    GITHUB_TOKEN_KEY, REPO_NAME, BRANCH,
-    CONFIG, OUTPUT_FILE, PIVOT_CONFIG,
-    FULL_MAPPING_COLUMNS, COLUMN_MAPPING
-)
-from github_utils import upload_to_github, download_excel_from_repo
-from preprocessing import apply_full_mapping, load_df
-from pivot_processor import create_pivot, process_date_column
-from excel_utils import adjust_column_width, auto_adjust_column_width_by_worksheet, add_black_border
-from merge_sections import (
-    merge_safety_inventory,
-    merge_unfulfilled_orders,
-    merge_prediction_data,
-    mark_unmatched_rows
+from config import GITHUB_TOKEN_KEY, PIVOT_CONFIG, output_filename
+from report_export import export_extension
+from github_utils import upload_files_to_github, fetch_excel_from_repo
+from schema_validation import validate_header
+from stage_cache import default_stage_cache, fingerprint
+from instrumentation import NullProfiler, Profiler
+from ui import (
+    setup_sidebar, get_user_inputs, get_profile_options, get_export_format, render_profile,
+    StreamlitReporter, MIME_TYPES
 )
-from ui import setup_sidebar, get_user_inputs
+
+def _validate_upload(f, name=None):
+    """只读表头校验上传文件（name 为其对应的文件类型，默认取上传文件名）；结果按内容指纹缓存。"""
+    name = name or f.name
+    errors = default_stage_cache.get_or_compute(
+        "validate", fingerprint(name, f.getvalue()), lambda: validate_header(name, f.getvalue())
+    )
+    for message in errors:
+        st.error(f"❌ {message}")
+    return not errors
+
+
+def _snapshot_store():
+    from snapshot_store import SnapshotStore
+    return SnapshotStore()
+
 
 def main():
     st.set_page_config(page_title='数据汇总自动化工具', layout='wide')
     setup_sidebar()
 
-    # 获取用户上传
-    uploaded_files, pred_file, safety_file, mapping_file = get_user_inputs()
-
-    # 加载文件
-    mapping_df = None
-    safety_df = None
-    pred_df = None
-    if safety_file:
-        safety_df = pd.read_excel(safety_file)
-        upload_to_github(safety_file, "safety_file.xlsx", "上传安全库存文件")
-    else:
-        safety_df = download_excel_from_repo("safety_file.xlsx")
-    if pred_file:
-        pred_df = pd.read_excel(pred_file)
-        upload_to_github(pred_file, "pred_file.xlsx", "上传预测文件")
-    else:
-        pred_df = download_excel_from_repo("pred_file.xlsx")
-    if mapping_file:
-        mapping_df = pd.read_excel(mapping_file)
-        upload_to_github(mapping_file, "mapping_file.xlsx", "上传新旧料号文件")
-    else:
-        mapping_df = download_excel_from_repo("mapping_file.xlsx")
-      
-    if st.button('🚀 提交并生成报告') and uploaded_files:
-        with pd.ExcelWriter(OUTPUT_FILE, engine='openpyxl') as writer:
-            summary_df = pd.DataFrame()
-            pending_df = None
-
-            # 处理 uploaded_files
-            for f in uploaded_files:
-                filename = f.name
-                if filename not in PIVOT_CONFIG:
-                    st.warning(f"跳过未配置的文件: {filename}")
-                    continue
-
-                df = pd.read_excel(f)
-                st.write(df)
-
-                # 替换新旧料号
-                if filename in COLUMN_MAPPING:
-                    mapping = COLUMN_MAPPING[filename]
-                    spec_col, prod_col, wafer_col = mapping["规格"], mapping["品名"], mapping["晶圆品名"]
-                    if all(col in df.columns for col in [spec_col, prod_col, wafer_col]):
-                        df = apply_full_mapping(df, mapping_df, spec_col, prod_col, wafer_col)
-                    else:
-                        st.warning(f"⚠️ 文件 {filename} 缺少字段: {spec_col}, {prod_col}, {wafer_col}")
-                else:
-                    st.info(f"📂 文件 {filename} 未定义映射字段，跳过 apply_full_mapping")
-
-
-                st.write(df)
-                # 透视
-                pivoted = create_pivot(df, PIVOT_CONFIG[filename], filename)
-                sheet_name = filename.replace('.xlsx', '')[:30]
-                pivoted.to_excel(writer, sheet_name=sheet_name, index=False)
-                adjust_column_width(writer, sheet_name, pivoted)
-                st.write(OUTPUT_FILE)
-
-                # 提取未交订单汇总
-                if filename == "赛卓-未交订单.xlsx":
-                    summary_df = pivoted[['晶圆品名', '规格', '品名']].drop_duplicates()
-                    pending_df = pivoted.copy()
-
-
-        # 下载按钮
-        with open(OUTPUT_FILE, 'rb') as f:
-            st.download_button('📥 下载汇总报告', f, OUTPUT_FILE)
+    # 获取用户上传；月份格式错误时 get_user_inputs 已提示，只禁止生成报告，已上传的文件保留
+    uploaded_files, pred_file, safety_file, mapping_file, selected_month, month_ok = get_user_inputs()
+
+    # 表头不符合要求的文件直接拒绝，不参与上传与解析
+    uploaded_files = [f for f in uploaded_files or [] if _validate_upload(f)]
+    pred_file, safety_file, mapping_file = (
+        f if f and _validate_upload(f, name) else None
+        for f, name in ((pred_file, "pred_file.xlsx"), (safety_file, "safety_file.xlsx"),
+                        (mapping_file, "mapping_file.xlsx"))
+    )
+    show_profile, track_memory = get_profile_options()
+    profiler = Profiler(track_memory=track_memory) if show_profile else NullProfiler()
+
+    # 参考文件：上传则解析上传内容，否则从 GitHub 读取
+    reference_files = {
+        "safety_file.xlsx": (safety_file, "安全库存文件"),
+        "pred_file.xlsx": (pred_file, "预测文件"),
+        "mapping_file.xlsx": (mapping_file, "新旧料号文件"),
+    }
+
+    # 变更的参考文件合并为一次提交，未变化的自动跳过
+    pending_uploads = {name: f for name, (f, _) in reference_files.items() if f}
+    if pending_uploads:
+        labels = [label for f, label in reference_files.values() if f]
+        upload_files_to_github(pending_uploads, f"上传{'、'.join(labels)}")
+
+    export_format = get_export_format()
+    save_snapshot = st.checkbox('💾 保存本次数据快照（Parquet，按月份）')
+
+    if st.button('🚀 提交并生成报告', disabled=not month_ok) and uploaded_files and month_ok:
+        # pandas / 透视流程等较重的模块在首次生成报告时才导入，页面首次打开更快
+        import pandas as pd
+        from loader import iter_load
+        from pipeline import build_report
+
+        # 并发加载：下载在线程池中进行，Excel 解析在进程池中进行；
+        # 内容未变化的上传文件直接复用上次解析结果
+        token = st.secrets[GITHUB_TOKEN_KEY]
+        input_keys = {f.name: fingerprint(f.getvalue()) for f in uploaded_files if f.name in PIVOT_CONFIG}
+        uploads = {f.name: f for f in uploaded_files if f.name in input_keys}
+        fetch_jobs = {}
+        for name, (f, _) in reference_files.items():
+            if f:
+                uploads[name] = f
+                input_keys[name] = fingerprint(f.getvalue())
+            else:
+                fetch_jobs[name] = partial(fetch_excel_from_repo, name, token)
+
+        loaded = {}
+        parse_jobs = {}
+        for name, f in uploads.items():
+            cached = default_stage_cache.get("read", input_keys[name])
+            if cached is not None:
+                loaded[name] = cached
+            else:
+                parse_jobs[name] = f.getvalue()
+
+        for result in iter_load(parse_jobs, fetch_jobs, track_memory=profiler.track_memory):
+            if result.error is not None:
+                st.warning(f"⚠️ 加载 {result.name} 失败：{result.error}")
+                continue
+            loaded[result.name] = result.df
+            stage = "read" if result.name in parse_jobs else "download"
+            profiler.add(stage, file=result.name, seconds=result.seconds, rows_out=len(result.df),
+                         peak_mb=result.peak_mb)
+            if result.name in input_keys:
+                default_stage_cache.put("read", input_keys[result.name], result.df)
+
+        mapping_df = loaded.get("mapping_file.xlsx", pd.DataFrame())
+        tables = {f.name: loaded[f.name] for f in uploaded_files if f.name in loaded}
+        for f in uploaded_files:
+            if f.name not in PIVOT_CONFIG:
+                st.warning(f"跳过未配置的文件: {f.name}")
+
+        # 报告只在内存中生成，直接交给下载按钮，不在服务器上留下文件
+        output = BytesIO()
+        build_report(
+            tables, mapping_df, output,
+            selected_month=selected_month, reporter=StreamlitReporter(),
+            cache=default_stage_cache, input_keys=input_keys, profiler=profiler,
+            snapshot_store=_snapshot_store() if save_snapshot else None,
+            safety_df=loaded.get("safety_file.xlsx"), pred_df=loaded.get("pred_file.xlsx"),
+            export_format=export_format
+        )
+        if show_profile:
+            render_profile(profiler)
+
+        extension = export_extension(export_format)
+        st.download_button(
+            '📥 下载汇总报告', output.getvalue(), output_filename(selected_month, extension),
+            mime=MIME_TYPES[extension]
+        )
 
 if __name__ == '__main__':
     main()
@@ -1,107 +1,164 @@
+from collections import namedtuple
+
 import pandas as pd
-from openpyxl.styles import Alignment, PatternFill
-from openpyxl.utils import get_column_letter
 
-from excel_utils import adjust_column_width, add_black_border
+SUMMARY_KEY_COLS = ['晶圆品名', '规格', '品名']
+PRED_KEY_COLS = ['晶圆品名', '产品型号', 'ProductionNO.']
+SAFETY_KEY_MAP = {'WaferID': '晶圆品名', 'OrderInformation': '规格', 'ProductionNO.': '品名'}
 
+ORDERS_FILE = "赛卓-未交订单.xlsx"
+FINISHED_WIP_FILE = "赛卓-成品在制.xlsx"
+CP_WIP_FILE = "赛卓-CP在制.xlsx"
+FINISHED_STOCK_FILE = "赛卓-成品库存.xlsx"
+WAFER_STOCK_FILE = "赛卓-晶圆库存.xlsx"
+SAFETY_FILE = "safety_file.xlsx"
+PRED_FILE = "pred_file.xlsx"
 
-def merge_safety_inventory(summary_df, df_safety, summary_sheet):
-    """
-    将安全库存数据合并到汇总 sheet，标红未匹配行。
-    """
-    df_safety.rename(columns={
-        'WaferID': '晶圆品名',
-        'OrderInformation': '规格',
-        'ProductionNO.': '品名'
-    }, inplace=True)
-    df_safety['已匹配'] = False
-
-    merged_df = summary_df.merge(
-        df_safety[['晶圆品名', '规格', '品名', ' InvWaf', ' InvPart']],
-        on=['晶圆品名', '规格', '品名'], how='left'
-    )
-    matched_index = df_safety.set_index(['晶圆品名', '规格', '品名']).index.isin(
-        merged_df.dropna(subset=[' InvWaf', ' InvPart']).set_index(['晶圆品名', '规格', '品名']).index
-    )
-    df_safety.loc[matched_index, '已匹配'] = True
-
-    # 写入合并列
-    summary_sheet.merge_cells('D1:E1')
-    summary_sheet['D1'] = '安全库存'
-    summary_sheet['D1'].alignment = Alignment(horizontal='center', vertical='center')
-    summary_sheet['D2'] = 'InvWaf（片）'
-    summary_sheet['D2'].alignment = Alignment(horizontal='center', vertical='center')
-    summary_sheet['E2'] = 'InvPart'
-    summary_sheet['E2'].alignment = Alignment(horizontal='center', vertical='center')
-
-    return merged_df, df_safety
-
-
-def merge_unfulfilled_orders(summary_sheet, pending_df, start_col):
-    """
-    将未交订单数量（历史和未来）写入汇总 sheet。
-    """
-    pending_cols = [col for col in pending_df.columns if '未交订单数量_' in col]
-    all_pending_cols = ['历史未交订单数量'] + pending_cols if '历史未交订单数量' in pending_df.columns else pending_cols
-    pending_df['总未交订单'] = pending_df[all_pending_cols].sum(axis=1)
+# 汇总表：列为 键列 + 各区块；区块对应第一行的合并表头，列名为第二行表头
+# matched 为 {参考文件名: 该文件每行是否匹配到汇总表}，用于在参考文件 sheet 中标红未匹配行
+SummaryTable = namedtuple("SummaryTable", ["frame", "header_groups", "matched"])
 
-    columns_to_write = ['总未交订单'] + all_pending_cols
 
-    end_col = start_col + len(columns_to_write) - 1
-    summary_sheet.merge_cells(start_row=1, start_column=start_col, end_row=1, end_column=end_col)
-    summary_sheet.cell(row=1, column=start_col, value='未交订单').alignment = Alignment(horizontal='center', vertical='center')
+def _normalize_keys(df, key_cols, as_codes=False):
+    """
+    将键列统一转为可比较的值：共享字典的 Categorical 取整数编码，否则转为字符串，
+    便于不同来源的料号做等值比较。
+    """
+    if as_codes:
+        return pd.DataFrame({col: df[col].cat.codes.values for col in key_cols})
+    return pd.DataFrame({col: df[col].map(str).values for col in key_cols})
 
-    # 写入标题
-    for idx, col in enumerate(columns_to_write, start=start_col):
-        summary_sheet.cell(row=2, column=idx, value=col).alignment = Alignment(horizontal='center', vertical='center')
 
-    return columns_to_write
+def _shares_key_dtype(columns):
+    """各键列是否都是同一个 CategoricalDtype（compact_dtypes 构建的共享字典）。"""
+    dtypes = [col.dtype for col in columns]
+    return isinstance(dtypes[0], pd.CategoricalDtype) and all(dtype == dtypes[0] for dtype in dtypes[1:])
 
 
-def merge_prediction_data(summary_sheet, df_pred, summary_df):
+def _lookup(keys, source, key_map, value_cols):
     """
-    将预测表中的数量与金额写入汇总表，标红未匹配行。
+    按 key_map（源列名 → 汇总键列名）把 source 的 value_cols 左连接到 keys 上。
+    重复键只保留首条。返回 (与 keys 对齐的值 DataFrame, source 每行是否匹配)。
     """
-    df_pred.columns = df_pred.iloc[0]
-    df_pred = df_pred.drop([0, 0]).reset_index(drop=True)
-    df_pred['已匹配'] = False
-
-    required_cols = ['晶圆品名', '产品型号', 'ProductionNO.', '合计数量', '合计金额']
-    if not all(col in df_pred.columns for col in required_cols):
-        return df_pred
-
-    start_col = summary_sheet.max_column + 1
-    summary_sheet.merge_cells(start_row=1, start_column=start_col, end_row=1, end_column=start_col+1)
-    summary_sheet.cell(row=1, column=start_col, value='预测').alignment = Alignment(horizontal='center', vertical='center')
-    summary_sheet.cell(row=2, column=start_col, value='合计数量').alignment = Alignment(horizontal='center', vertical='center')
-    summary_sheet.cell(row=2, column=start_col+1, value='合计金额').alignment = Alignment(horizontal='center', vertical='center')
-
-    for row_idx in range(3, summary_sheet.max_row + 1):
-        summary_key = [
-            summary_sheet.cell(row=row_idx, column=1).value,
-            summary_sheet.cell(row=row_idx, column=2).value,
-            summary_sheet.cell(row=row_idx, column=3).value
-        ]
-        match = df_pred[
-            (df_pred['晶圆品名'].astype(str) == str(summary_key[0])) &
-            (df_pred['产品型号'].astype(str) == str(summary_key[1])) &
-            (df_pred['ProductionNO.'].astype(str) == str(summary_key[2]))
-        ]
-        if not match.empty:
-            qty, amt = match['合计数量'].values[0], match['合计金额'].values[0]
-            summary_sheet.cell(row=row_idx, column=start_col, value=qty)
-            summary_sheet.cell(row=row_idx, column=start_col+1, value=amt)
-            df_pred.loc[match.index, '已匹配'] = True
-
-    return df_pred
-
-
-def mark_unmatched_rows(ws, df, start_row=2, color="FF0000"):
+    on = list(key_map.values())
+    as_codes = _shares_key_dtype([source[col] for col in key_map] + [keys[col] for col in on])
+    source_keys = _normalize_keys(source, list(key_map), as_codes)
+    source_keys.columns = on
+    right = pd.concat([source_keys, source[value_cols].reset_index(drop=True)], axis=1)
+    right = right.drop_duplicates(subset=on, keep='first')
+
+    left = _normalize_keys(keys, on, as_codes)
+    values = left.merge(right, on=on, how='left')[value_cols]
+    matched = pd.MultiIndex.from_frame(source_keys).isin(pd.MultiIndex.from_frame(left))
+    return values, matched
+
+
+def _month_columns(df, prefix):
+    return [col for col in df.columns if str(col).startswith(prefix)]
+
+
+def _total(df, key_map, prefix, label):
+    """按 key_map 的键列对以 prefix 开头的月份/仓库列求总和，得到单列 label。"""
+    cols = _month_columns(df, prefix)
+    totals = df[list(key_map)].assign(**{label: df[cols].sum(axis=1)})
+    return totals.groupby(list(key_map), observed=True, sort=False, as_index=False)[label].sum()
+
+
+def _safety_section(keys, pivots, safety_df, pred_df):
+    if safety_df is None or not all(col in safety_df.columns for col in list(SAFETY_KEY_MAP) + [' InvWaf', ' InvPart']):
+        return None
+    values, matched = _lookup(keys, safety_df, SAFETY_KEY_MAP, [' InvWaf', ' InvPart'])
+    values.columns = ['InvWaf（片）', 'InvPart']
+    # 与原 merge_safety_inventory 一致：料号在汇总表中且 InvWaf / InvPart 都有值才算匹配
+    matched = matched & safety_df[[' InvWaf', ' InvPart']].notna().all(axis=1).to_numpy()
+    return values, {SAFETY_FILE: matched}
+
+
+def _orders_section(keys, pivots, safety_df, pred_df):
+    orders = pivots.get(ORDERS_FILE)
+    if orders is None:
+        return None
+    pending_cols = _month_columns(orders, '未交订单数量_')
+    if '历史未交订单数量' in orders.columns:
+        pending_cols = ['历史未交订单数量'] + pending_cols
+    values, _ = _lookup(keys, orders, {col: col for col in SUMMARY_KEY_COLS}, pending_cols)
+    values.insert(0, '总未交订单', values.sum(axis=1))
+    return values, {}
+
+
+def _prediction_section(keys, pivots, safety_df, pred_df):
+    if pred_df is None:
+        return None
+    required_cols = PRED_KEY_COLS + ['合计数量', '合计金额']
+    if not all(col in pred_df.columns for col in required_cols):
+        return None
+    values, matched = _lookup(keys, pred_df, dict(zip(PRED_KEY_COLS, SUMMARY_KEY_COLS)), ['合计数量', '合计金额'])
+    return values, {PRED_FILE: matched}
+
+
+def _total_section(filename, key_map, prefix, label):
+    def section(keys, pivots, safety_df, pred_df):
+        pivoted = pivots.get(filename)
+        if pivoted is None or pivoted.empty:
+            return None
+        values, _ = _lookup(keys, _total(pivoted, key_map, prefix, label), key_map, [label])
+        return values, {}
+    return section
+
+
+def _finished_stock_section(keys, pivots, safety_df, pred_df):
+    stock = pivots.get(FINISHED_STOCK_FILE)
+    if stock is None or stock.empty:
+        return None
+    warehouses = _month_columns(stock, '数量_')
+    values, _ = _lookup(keys, stock, dict(zip(['WAFER品名', '规格', '品名'], SUMMARY_KEY_COLS)), warehouses)
+    values.columns = [col[len('数量_'):] for col in warehouses]
+    return values, {}
+
+
+# 区块顺序即汇总表中的列顺序：(合并表头, 生成函数)
+SUMMARY_SECTIONS = [
+    ("安全库存", _safety_section),
+    ("未交订单", _orders_section),
+    ("预测", _prediction_section),
+    ("成品在制", _total_section(
+        FINISHED_WIP_FILE, {'晶圆型号': '晶圆品名', '产品规格': '规格', '产品品名': '品名'}, '未交_', '成品在制')),
+    ("CP在制", _total_section(CP_WIP_FILE, {'晶圆型号': '晶圆品名', '产品品名': '品名'}, '未交_', 'CP在制')),
+    ("成品库存", _finished_stock_section),
+    ("晶圆库存", _total_section(WAFER_STOCK_FILE, {'WAFER品名': '晶圆品名'}, '数量_', '晶圆库存')),
+]
+
+
+def prepare_prediction(df_pred):
+    """预测文件第一行为汇总数字，第二行（读入后的第 0 行）才是字段名。"""
+    df_pred = df_pred.set_axis(list(df_pred.iloc[0]), axis=1)
+    return df_pred.iloc[1:].reset_index(drop=True)
+
+
+def build_summary(pivots, safety_df=None, pred_df=None):
     """
-    在 worksheet 中标红未匹配的 DataFrame 行。
+    以未交订单透视表中的料号为行，一次连接出整张汇总表：
+    键列 | 安全库存 | 未交订单（总计/历史/各月） | 预测 | 成品在制 | CP在制 | 成品库存 | 晶圆库存。
+    缺少来源文件的区块不生成。pred_df 为 prepare_prediction 处理后的预测表。
+    返回 SummaryTable；写入时 header_groups 作为第一行合并表头。
     """
-    red_fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
-    for row_idx, matched in enumerate(df['已匹配'], start=start_row):
-        if not matched:
-            for col_idx in range(1, len(df.columns) + 1):
-                ws.cell(row=row_idx, column=col_idx).fill = red_fill
+    orders = pivots.get(ORDERS_FILE)
+    if orders is None or orders.empty:
+        return None
+    keys = orders[SUMMARY_KEY_COLS].drop_duplicates().reset_index(drop=True)
+
+    blocks, header_groups, matched = [keys], [], {}
+    col = len(SUMMARY_KEY_COLS) + 1
+    for title, section in SUMMARY_SECTIONS:
+        result = section(keys, pivots, safety_df, pred_df)
+        if result is None:
+            continue
+        values, section_matched = result
+        matched.update(section_matched)
+        if values.shape[1] == 0:
+            continue
+        blocks.append(values)
+        header_groups.append((title, col, col + values.shape[1] - 1))
+        col += values.shape[1]
+
+    return SummaryTable(pd.concat(blocks, axis=1), header_groups, matched)
@@ -0,0 +1,330 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+
+import pandas as pd
+
+from compact_dtypes import compact_tables
+from config import PIVOT_CONFIG, COLUMN_MAPPING
+from excel_utils import compute_sheet_widths, process_date_column
+from instrumentation import NullProfiler, Profiler
+from merge_sections import SAFETY_FILE, PRED_FILE, build_summary, prepare_prediction
+from pivot_processor import create_pivot, add_historical_order_columns
+from preprocessing import apply_full_mapping, compile_mapping
+from report_export import write_archive
+from report_writer import StreamingReportWriter
+from reporting import NullReporter
+from stage_cache import fingerprint
+
+PENDING_ORDERS_FILE = "赛卓-未交订单.xlsx"
+SUMMARY_SHEET = "汇总"
+REFERENCE_SHEETS = {SAFETY_FILE: "安全库存", PRED_FILE: "预测"}
+
+# prepare_pivots 的结果：{文件名: 透视表}、类型压缩后的参考表 {参考文件名: DataFrame}
+# 与编译好的料号索引（供 prepare_references 复用，不再重复编译）
+PreparedPivots = namedtuple("PreparedPivots", ["pivots", "references", "mapping_index"])
+
+
+def sheet_name_for(filename):
+    """输出 sheet 名：去掉扩展名，截断到 Excel 允许的长度。"""
+    return filename.replace('.xlsx', '')[:30]
+
+
+def map_part_numbers(df, filename, mapping_index, reporter):
+    """
+    按 COLUMN_MAPPING 替换新旧料号；缺少字段时给出警告并原样返回。
+    """
+    if filename not in COLUMN_MAPPING:
+        reporter.info(f"📂 文件 {filename} 未定义映射字段，跳过 apply_full_mapping")
+        return df
+
+    mapping = COLUMN_MAPPING[filename]
+    spec_col, prod_col, wafer_col = mapping["规格"], mapping["品名"], mapping["晶圆品名"]
+    if not all(col in df.columns for col in [spec_col, prod_col, wafer_col]):
+        reporter.warning(f"⚠️ 文件 {filename} 缺少字段: {spec_col}, {prod_col}, {wafer_col}")
+        return df
+
+    value_cols = PIVOT_CONFIG[filename]['values'] if filename in PIVOT_CONFIG else None
+    return apply_full_mapping(df, mapping_index, spec_col, prod_col, wafer_col, value_cols=value_cols)
+
+
+def pivot_file(df, filename, mapping_index, selected_month=None, reporter=None, cache=None, input_key=None,
+               profiler=None, mapped_tables=None):
+    """
+    单个文件的处理：替换料号 → 日期列处理 → 透视 →（未交订单）历史月份汇总。
+    传入 cache 与 input_key（输入文件指纹）时，各阶段结果按指纹缓存，
+    指纹由上游指纹、该文件的 PIVOT_CONFIG/COLUMN_MAPPING 配置与料号表版本组成。
+    传入 mapped_tables（dict）时，替换料号后的表会以文件名为键放入其中。
+    """
+    reporter = reporter or NullReporter()
+    profiler = profiler or NullProfiler()
+    cache = cache if input_key is not None else None
+    config = PIVOT_CONFIG[filename]
+
+    def run(stage, key, compute, rows_in):
+        with profiler.stage(stage, file=filename, rows_in=rows_in) as record:
+            result = compute() if cache is None else cache.get_or_compute(stage, key, compute)
+            record.rows_out = len(result)
+        return result
+
+    map_key = fingerprint(input_key, filename, COLUMN_MAPPING.get(filename), mapping_index.fingerprint)
+    df = run("map", map_key, lambda: map_part_numbers(df, filename, mapping_index, reporter), len(df))
+    reporter.show(df)
+    if mapped_tables is not None:
+        mapped_tables[filename] = df
+
+    def pivot():
+        dated = df
+        if 'date_format' in config and config['columns'] in df.columns:
+            dated = process_date_column(df, config['columns'], config['date_format'])
+        return create_pivot(dated, config, filename, reporter=reporter)
+
+    pivot_key = fingerprint(map_key, config)
+    pivoted = run("pivot", pivot_key, pivot, len(df))
+
+    if selected_month and filename == PENDING_ORDERS_FILE and not pivoted.empty:
+        pivoted = run(
+            "rollup", fingerprint(pivot_key, selected_month),
+            lambda: add_historical_order_columns(pivoted, config, selected_month),
+            len(pivoted)
+        )
+    return pivoted
+
+
+def reference_tables(safety_df=None, pred_df=None):
+    """
+    参考文件 {文件名: DataFrame}，交给 prepare_pivots 与核心文件一起做类型压缩；
+    预测表先经 prepare_prediction 取第二行为表头。未提供的文件不出现在结果中。
+    """
+    references = {SAFETY_FILE: safety_df, PRED_FILE: None if pred_df is None else prepare_prediction(pred_df)}
+    return {name: df for name, df in references.items() if df is not None}
+
+
+def prepare_references(references, mapping_index):
+    """
+    references（prepare_pivots 返回的参考表）中的安全库存与预测表按 COLUMN_MAPPING 替换为新料号
+    （与核心文件使用同一个料号索引），使其能与汇总表中已替换的料号匹配。
+    逐行替换、不合并行，参考 sheet 中的行与原表一一对应。返回 (safety_df, pred_df)。
+    """
+    def remap(filename):
+        df = references.get(filename)
+        if df is None:
+            return None
+        cols = COLUMN_MAPPING[filename]
+        if not all(col in df.columns for col in cols.values()):
+            return df
+        return mapping_index.remap(df, cols["规格"], cols["品名"], cols["晶圆品名"], value_cols=[])
+
+    return remap(SAFETY_FILE), remap(PRED_FILE)
+
+
+def write_summary(writer, pivots, safety_df=None, pred_df=None, profiler=None):
+    """
+    汇总 sheet 放在最前：整表一次连接、一次写入，两行表头；
+    安全库存与预测另写为 sheet，未匹配到汇总表的行标红。
+    safety_df / pred_df 为 prepare_references 处理后的表。
+    """
+    profiler = profiler or NullProfiler()
+    references = {SAFETY_FILE: safety_df, PRED_FILE: pred_df}
+    with profiler.stage("summary") as record:
+        summary = build_summary(pivots, references[SAFETY_FILE], references[PRED_FILE])
+        if summary is None:
+            return None
+        frames = {SUMMARY_SHEET: summary.frame}
+        frames.update({REFERENCE_SHEETS[name]: references[name] for name in summary.matched})
+        widths = compute_sheet_widths(frames)
+        writer.write_sheet(SUMMARY_SHEET, summary.frame, header_groups=summary.header_groups, border=True,
+                           widths=widths[SUMMARY_SHEET], index=0)
+        for name, matched in summary.matched.items():
+            sheet = REFERENCE_SHEETS[name]
+            writer.write_sheet(sheet, references[name], highlight=~matched, widths=widths[sheet])
+        record.rows_out = len(summary.frame)
+    return summary
+
+
+def prepare_pivots(tables, mapping_df, selected_month=None, reporter=None, cache=None, input_keys=None,
+                   profiler=None, mapped_tables=None, references=None):
+    """
+    编译料号表 → 类型压缩 → 各文件替换料号与透视，返回 PreparedPivots。
+    selected_month 为空时不做未交订单的历史月份汇总（见 with_month），结果与月份无关，可供多个月份共用。
+    references 为 reference_tables 的结果：与核心文件共用同一个键列字典，汇总表连接时直接比较整数编码。
+    """
+    reporter = reporter or NullReporter()
+    profiler = profiler or NullProfiler()
+    input_keys = input_keys or {}
+
+    # 料号表按版本编译一次，所有文件共享
+    with profiler.stage("compile_mapping", rows_in=None if mapping_df is None else len(mapping_df)) as record:
+        mapping_index = compile_mapping(mapping_df)
+        record.rows_out = len(mapping_index)
+    for cycle in mapping_index.cycles:
+        reporter.warning(f"⚠️ 新旧料号存在循环替换，已跳过: {' → '.join(map(str, cycle))}")
+
+    # 数量列降位、键列转为共享字典的 Categorical；输入与料号表都未变化时直接复用
+    references = references or {}
+    inputs = {**tables, **references}
+    with profiler.stage("compact", rows_in=sum(len(df) for df in inputs.values())) as record:
+        def compact():
+            return compact_tables(inputs, mapping_index)[0]
+        if cache is not None and all(name in input_keys for name in inputs):
+            compact_key = fingerprint(sorted((name, input_keys[name]) for name in inputs), mapping_index.fingerprint)
+            compacted = cache.get_or_compute("compact", compact_key, compact)
+        else:
+            compacted = compact()
+        tables = {name: compacted[name] for name in tables}
+        references = {name: compacted[name] for name in references}
+        record.rows_out = sum(len(df) for df in compacted.values())
+
+    pivots = {}
+    for filename, df in tables.items():
+        if filename not in PIVOT_CONFIG:
+            reporter.warning(f"跳过未配置的文件: {filename}")
+            continue
+
+        reporter.progress(f"处理 {filename}")
+        pivots[filename] = pivot_file(
+            df, filename, mapping_index, selected_month, reporter,
+            cache=cache, input_key=input_keys.get(filename), profiler=profiler,
+            mapped_tables=mapped_tables
+        )
+    return PreparedPivots(pivots, references, mapping_index)
+
+
+def with_month(pivots, selected_month, profiler=None):
+    """对 prepare_pivots(selected_month=None) 的结果按截至月份汇总未交订单，返回新的 dict。"""
+    profiler = profiler or NullProfiler()
+    orders = pivots.get(PENDING_ORDERS_FILE)
+    if not selected_month or orders is None or orders.empty:
+        return pivots
+    with profiler.stage("rollup", file=PENDING_ORDERS_FILE, rows_in=len(orders)) as record:
+        rolled = add_historical_order_columns(orders, PIVOT_CONFIG[PENDING_ORDERS_FILE], selected_month)
+        record.rows_out = len(rolled)
+    return {**pivots, PENDING_ORDERS_FILE: rolled}
+
+
+def report_sheets(pivots, safety_df=None, pred_df=None):
+    """与 xlsx 报告相同的 sheet（汇总、各透视表、安全库存/预测），只有数据：{sheet 名: DataFrame}。"""
+    summary = build_summary(pivots, safety_df, pred_df)
+    sheets = {} if summary is None else {SUMMARY_SHEET: summary.frame}
+    sheets.update({sheet_name_for(filename): pivoted for filename, pivoted in pivots.items()})
+    if summary is not None:
+        references = {SAFETY_FILE: safety_df, PRED_FILE: pred_df}
+        sheets.update({REFERENCE_SHEETS[name]: references[name] for name in summary.matched})
+    return sheets
+
+
+def write_report(pivots, output, safety_df=None, pred_df=None, profiler=None, export_format="xlsx"):
+    """
+    将透视表（按给定顺序）与汇总 sheet 写入 output（文件路径或可写的二进制缓冲区）。
+    export_format 为 parquet / csv 时输出 zip 包，见 report_export。
+    """
+    profiler = profiler or NullProfiler()
+    if export_format != "xlsx":
+        with profiler.stage("export") as record:
+            sheets = report_sheets(pivots, safety_df, pred_df)
+            write_archive(sheets, output, export_format)
+            record.rows_out = sum(len(df) for df in sheets.values())
+        return
+
+    writer = StreamingReportWriter(output)
+    for filename, pivoted in pivots.items():
+        with profiler.stage("write", file=filename, rows_in=len(pivoted)) as record:
+            writer.write_sheet(sheet_name_for(filename), pivoted)
+            record.rows_out = len(pivoted)
+
+    write_summary(writer, pivots, safety_df, pred_df, profiler)
+    with profiler.stage("save"):
+        writer.save()
+
+
+def snapshot_month(selected_month):
+    return str(selected_month) if selected_month else pd.Timestamp.now().strftime('%Y-%m')
+
+
+def build_report(tables, mapping_df, output, selected_month=None, reporter=None, cache=None, input_keys=None,
+                 profiler=None, snapshot_store=None, safety_df=None, pred_df=None, export_format="xlsx"):
+    """
+    根据已读取的文件生成汇总报告并写入 output（文件路径或可写的二进制缓冲区）。
+    tables 为 {文件名: DataFrame}，按给定顺序写入 sheet；返回 {文件名: 透视表}。
+    input_keys 为 {文件名: 输入指纹}；与 cache 一起传入时只重算输入或配置变化的文件，
+    其余文件直接使用缓存的透视表重新组装工作簿。
+    profiler 记录各阶段、各文件的耗时与行数。
+    传入 snapshot_store 时，替换料号后的输入与透视表按月份（截至月份，默认当月）存为 Parquet 快照。
+    有未交订单时在最前面加一张汇总 sheet（见 write_summary），safety_df / pred_df 为安全库存与预测原表。
+    export_format 为 parquet / csv 时不生成 xlsx，而是把同样的 sheet 打包为 zip。
+    """
+    profiler = profiler or NullProfiler()
+    mapped_tables = {} if snapshot_store is not None else None
+    pivots, references, mapping_index = prepare_pivots(
+        tables, mapping_df, selected_month, reporter, cache, input_keys, profiler, mapped_tables,
+        reference_tables(safety_df, pred_df)
+    )
+    safety_df, pred_df = prepare_references(references, mapping_index)
+    write_report(pivots, output, safety_df, pred_df, profiler, export_format)
+
+    if snapshot_store is not None:
+        with profiler.stage("snapshot"):
+            snapshot_store.save_run(snapshot_month(selected_month), inputs=mapped_tables, reports=pivots)
+
+    return pivots
+
+
+def _month_report(pivots, selected_month, output, safety_df, pred_df, snapshot_store, track_memory, export_format):
+    """在工作进程中生成一个月份的报告；output 为 None 时返回报告的字节内容。"""
+    profiler = Profiler(track_memory=track_memory) if track_memory is not None else NullProfiler()
+    pivots = with_month(pivots, selected_month, profiler)
+    target = output if output is not None else BytesIO()
+    write_report(pivots, target, safety_df, pred_df, profiler, export_format)
+    if snapshot_store is not None:
+        with profiler.stage("snapshot"):
+            snapshot_store.save_run(snapshot_month(selected_month), reports=pivots)
+    result = output if output is not None else target.getvalue()
+    return selected_month, result, profiler.to_dicts()
+
+
+def build_reports(tables, mapping_df, months, outputs=None, reporter=None, cache=None, input_keys=None,
+                  profiler=None, snapshot_store=None, safety_df=None, pred_df=None, max_workers=None,
+                  export_format="xlsx"):
+    """
+    同一批输入生成多个截至月份的报告：读取后的替换料号与透视只做一次，
+    各月份的历史汇总与工作簿写入在进程池中并行完成。月份通过参数传入各进程，不依赖全局状态。
+    outputs 为 {月份: 输出路径}；未给出路径的月份返回报告字节内容。export_format 同 build_report。
+    返回 {月份: 输出路径或字节内容}，顺序与 months 一致。
+    传入 snapshot_store 时各月份的透视表分别保存；替换料号后的输入与截至月份无关，只保存一份，
+    放在最晚的截至月份下。
+    """
+    profiler = profiler or NullProfiler()
+    outputs = outputs or {}
+    months = list(months)
+    mapped_tables = {} if snapshot_store is not None else None
+    pivots, references, mapping_index = prepare_pivots(
+        tables, mapping_df, None, reporter, cache, input_keys, profiler, mapped_tables,
+        reference_tables(safety_df, pred_df)
+    )
+
+    if snapshot_store is not None:
+        with profiler.stage("snapshot"):
+            snapshot_store.save_run(max(snapshot_month(month) for month in months), inputs=mapped_tables)
+
+    # 各进程自行统计，结束后并入 profiler；None 表示不统计
+    track_memory = None if isinstance(profiler, NullProfiler) else profiler.track_memory
+    safety_df, pred_df = prepare_references(references, mapping_index)
+    args = [(pivots, month, outputs.get(month), safety_df, pred_df, snapshot_store, track_memory, export_format)
+            for month in months]
+    max_workers = max_workers or min(len(months), os.cpu_count() or 1) or 1
+
+    results = {}
+    if max_workers == 1 or len(months) <= 1:
+        finished = (_month_report(*job) for job in args)
+        for month, result, records in finished:
+            results[month] = result
+            profiler.extend(records, label=month)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_month_report, *job) for job in args]
+            for future in as_completed(futures):
+                month, result, records = future.result()
+                results[month] = result
+                profiler.extend(records, label=month)
+    return {month: results[month] for month in months}
@@ -1,76 +1,166 @@
+import re
+from collections import namedtuple
+
+import numpy as np
 import pandas as pd
-from preprocessing import apply_full_mapping
-from excel_utils import process_date_column
-from config import CONFIG
-import streamlit as st
-
-def process_date_column(df, date_col, date_format):
-    """处理日期列，将其转换为 datetime 并创建格式化列"""
-    df = df.copy()
-    if pd.api.types.is_numeric_dtype(df[date_col]):
-        df[date_col] = pd.to_datetime('1899-12-30') + pd.to_timedelta(df[date_col], unit='D')
-    else:
-        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-    df[f"{date_col}_年月"] = df[date_col].dt.strftime(date_format)
-    return df
-
-def create_pivot(df, config, filename, mapping_df=None):
+from excel_utils import format_month_label
+from reporting import NullReporter
+
+def _pivot_sum(df, index, columns, values, date_format):
+    """
+    aggfunc 为 sum 时的快速透视：索引与列键先编码为整数，再用 np.bincount 一次性聚合。
+    结果与 pd.pivot_table(..., fill_value=0) 后展开列名一致。
+    """
+    keys = index + [columns]
+    df = df[df[keys].notna().all(axis=1)]
+
+    # 用 groupby 编码，排序规则与 pivot_table 完全相同
+    row_groups = df.groupby(index, sort=True, observed=True)
+    col_groups = df.groupby(columns, sort=True, observed=True)
+    row_codes, row_keys = row_groups.ngroup().to_numpy(), row_groups.size().index
+    col_codes, col_keys = col_groups.ngroup().to_numpy(), col_groups.size().index
+    n_rows, n_cols = len(row_keys), len(col_keys)
+    cell_codes = row_codes * n_cols + col_codes
+
+    # 与 pivot_table 一致：值字段按名称排序
+    blocks = []
+    for value in sorted(values):
+        series = df[value]
+        block = np.bincount(cell_codes, weights=series.fillna(0).to_numpy(dtype='float64'),
+                            minlength=n_rows * n_cols).reshape(n_rows, n_cols)
+        if pd.api.types.is_integer_dtype(series) or pd.api.types.is_bool_dtype(series):
+            block = block.astype('int64')
+        labels = [f"{value}_{format_month_label(key, date_format)}" for key in col_keys]
+        blocks.append(pd.DataFrame(block, columns=labels))
+
+    return pd.concat([row_keys.to_frame(index=False)] + blocks, axis=1)
+
+
+def _can_use_fast_pivot(df, config):
+    if config['aggfunc'] != 'sum' or df.empty:
+        return False
+    values = config['values'] if isinstance(config['values'], list) else [config['values']]
+    return all(
+        pd.api.types.is_numeric_dtype(df[value]) and not pd.api.types.is_complex_dtype(df[value])
+        for value in values
+    )
+
+
+def create_pivot(df, config, filename, mapping_df=None, reporter=None):
     """
     根据配置创建透视表，自动处理日期格式列名（如 _年月）
     """
-    df_copy = df.copy()
+    reporter = reporter or NullReporter()
     if 'date_format' in config:
         config = config.copy()
         config['columns'] = f"{config['columns']}_年月"
+    date_format = config.get('date_format', "%Y-%m")
 
-    try:
-        pivoted = pd.pivot_table(
-            df_copy,
-            index=config['index'],
-            columns=config['columns'],
-            values=config['values'],
-            aggfunc=config['aggfunc'],
-            fill_value=0
-        )
-    except KeyError as e:
-        st.warning(f"⚠️ 创建透视表失败，字段缺失: {e}")
+    missing = [
+        col for col in config['index'] + [config['columns']] + list(config['values'])
+        if col not in df.columns
+    ]
+    if missing:
+        reporter.warning(f"⚠️ 创建透视表失败，字段缺失: {missing}")
         return pd.DataFrame()
 
+    if _can_use_fast_pivot(df, config):
+        try:
+            return _pivot_sum(df, config['index'], config['columns'], list(config['values']), date_format)
+        except TypeError:
+            # 键列混有无法排序的类型时退回通用实现
+            pass
+
+    pivoted = pd.pivot_table(
+        df,
+        index=config['index'],
+        columns=config['columns'],
+        values=config['values'],
+        aggfunc=config['aggfunc'],
+        fill_value=0,
+        observed=True
+    )
+
     pivoted.columns = [
-        f"{col[0]}_{col[1]}" if isinstance(col, tuple) else str(col)
+        f"{col[0]}_{format_month_label(col[1], date_format)}" if isinstance(col, tuple) else str(col)
         for col in pivoted.columns
     ]
     pivoted = pivoted.reset_index()
     return pivoted
 
-def add_historical_order_columns(pivoted_df, config):
+
+# 月份汇总区间：相对截至月份的偏移（含两端，None 表示不设界），keep_months 为 False 时删除被汇总的月份列
+MonthBucket = namedtuple("MonthBucket", ["label", "start", "end", "keep_months"])
+
+HISTORY_BUCKETS = [MonthBucket("历史", None, -1, False)]
+
+
+def parse_month_columns(columns):
     """
-    对透视表添加 '历史订单数量' 与 '历史未交订单数量' 列，并删除原始旧列。
+    解析透视表列名 '{字段}_{YYYY-MM}'，返回以列名为索引、含 value 与 month（Period）两列的 DataFrame。
+    非月份列不出现在结果中。
     """
-    history_cols = [
-        col for col in pivoted_df.columns
-        if '_' in col and col.split('_')[-1][:4].isdigit() and col.split('_')[-1] < CONFIG['selected_month']
-    ]
+    parts = pd.Index(columns).astype(str).str.extract(r'^(.+)_(\d{4}-\d{2})$')
+    parts.index = columns
+    parts = parts.dropna()
+    return pd.DataFrame({
+        'value': parts[0],
+        'month': pd.PeriodIndex(parts[1], freq='M'),
+    }, index=parts.index)
 
-    history_order_cols = [
-        col for col in history_cols if '订单数量' in col and '未交订单数量' not in col
-    ]
-    history_pending_cols = [
-        col for col in history_cols if '未交订单数量' in col
-    ]
 
-    if history_order_cols:
-        pivoted_df['历史订单数量'] = pivoted_df[history_order_cols].sum(axis=1)
-    if history_pending_cols:
-        pivoted_df['历史未交订单数量'] = pivoted_df[history_pending_cols].sum(axis=1)
+def parse_month(text):
+    """
+    将截至月份（如 '2025-03'、'2025/3'、'202503'、'2025年3月'）解析为 pd.Period(freq='M')。
+    已是 Period 时原样返回；无法识别时抛出 ValueError。
+    """
+    if isinstance(text, pd.Period):
+        return text.asfreq('M')
+    match = re.fullmatch(r'\s*(\d{4})\s*(?:[-/.年]\s*)?(\d{1,2})\s*月?\s*', str(text))
+    if match is None or not 1 <= int(match.group(2)) <= 12:
+        raise ValueError(f"无法识别的月份：{text!r}（应为 YYYY-MM，如 2025-03）")
+    return pd.Period(year=int(match.group(1)), month=int(match.group(2)), freq='M')
+
+
+def rollup_month_buckets(pivoted_df, index_cols, cutoff_month, buckets, values=None):
+    """
+    按截至月份（pd.Period，见 parse_month）把月份列汇总到各区间（如 历史 / 当月 / 未来 N 个月 / 更远）。
+    每个区间、每个字段只做一次矩阵求和，生成 '{区间}{字段}' 列并放在索引列之后；
+    没有任何月份落在某区间时不生成该列。values 指定字段顺序，默认按列出现顺序。
+    """
+    months = parse_month_columns(pivoted_df.columns)
+    offsets = pd.Series(
+        months['month'].array.asi8 - cutoff_month.ordinal,
+        index=months.index
+    )
+
+    bucket_cols = {}
+    drop_cols = set()
+    for bucket in buckets:
+        in_bucket = pd.Series(True, index=months.index)
+        if bucket.start is not None:
+            in_bucket &= offsets >= bucket.start
+        if bucket.end is not None:
+            in_bucket &= offsets <= bucket.end
+        selected = months[in_bucket]
+        groups = selected.groupby('value', sort=False).groups
+        for value in (values or list(groups)):
+            if value in groups:
+                bucket_cols[f"{bucket.label}{value}"] = pivoted_df[list(groups[value])].to_numpy().sum(axis=1)
+        if not bucket.keep_months:
+            drop_cols.update(selected.index)
 
-    pivoted_df.drop(columns=history_cols, inplace=True)
+    rest = [col for col in pivoted_df.columns if col not in drop_cols and col not in index_cols]
+    return pd.concat([
+        pivoted_df[index_cols],
+        pd.DataFrame(bucket_cols, index=pivoted_df.index),
+        pivoted_df[rest]
+    ], axis=1)
 
-    fixed_cols = [col for col in pivoted_df.columns if col not in ['历史订单数量', '历史未交订单数量']]
-    if '历史订单数量' in pivoted_df.columns:
-        fixed_cols.insert(len(config['index']), '历史订单数量')
-    if '历史未交订单数量' in pivoted_df.columns:
-        fixed_cols.insert(len(config['index']) + 1, '历史未交订单数量')
 
-    pivoted_df = pivoted_df[fixed_cols]
-    return pivoted_df
+def add_historical_order_columns(pivoted_df, config, selected_month):
+    """
+    对透视表添加 '历史订单数量' 与 '历史未交订单数量' 列，并删除原始旧列。
+    selected_month 为截至月份（parse_month 得到的 pd.Period），由调用方按次传入。
+    """
+    return rollup_month_buckets(pivoted_df, config['index'], selected_month, HISTORY_BUCKETS, config['values'])
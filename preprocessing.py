@@ -1,13 +1,18 @@
+import hashlib
+
+import numpy as np
 import pandas as pd
-import streamlit as st
 
-from github_utils import upload_to_github, download_excel_from_repo
+from config import FULL_MAPPING_COLUMNS
+
 
 def load_df(uploaded, fallback_filename, shown):
     """
     如果上传了文件，就用 pd.read_excel 读取它；
     否则调用 download_excel_from_repo 下载并直接返回 DataFrame。
     """
+    from github_utils import upload_to_github, download_excel_from_repo
+
     if uploaded is not None:
         return pd.read_excel(uploaded)
         upload_to_github(uploaded, fallback_filename, shown)
@@ -17,41 +22,159 @@ def load_df(uploaded, fallback_filename, shown):
   
         
 
-def apply_full_mapping(df, mapping_df, spec_col, prod_col, wafer_col, show_changes=True):
+class MappingIndex:
+    """
+    编译后的新旧料号索引：旧料号 (规格, 品名, 晶圆品名) → 最终新料号。
+    多级替换（旧→中→新）会被折叠为一跳，成环的料号保持原样并记录在 cycles 中。
+    """
+
+    def __init__(self, mapping_df, fingerprint=None):
+        self.cycles = []
+        # 料号表版本指纹，供阶段缓存区分不同版本的替换结果
+        self.fingerprint = fingerprint
+        if mapping_df is None or mapping_df.empty:
+            self._old_index = pd.MultiIndex.from_arrays([[], [], []])
+            self._new_values = np.empty((0, 3), dtype=object)
+            return
+
+        mapping_df = mapping_df.iloc[:, :len(FULL_MAPPING_COLUMNS)]
+        mapping_df.columns = FULL_MAPPING_COLUMNS[:mapping_df.shape[1]]
+        old = mapping_df[['旧规格', '旧品名', '旧晶圆品名']]
+        new = mapping_df[['新规格', '新品名', '新晶圆品名']]
+        # 新字段为空时沿用旧字段，与 combine_first 的语义一致
+        new = pd.DataFrame(np.where(new.isna(), old.values, new.values))
+
+        direct = {}
+        for old_key, new_key in zip(_key_tuples(old), _key_tuples(new)):
+            if old_key != new_key:
+                direct.setdefault(old_key, new_key)
+
+        resolved = {}
+        for key in direct:
+            self._resolve(key, direct, resolved)
+        resolved = {k: v for k, v in resolved.items() if v is not None and v != k}
+
+        keys = list(resolved)
+        self._old_index = pd.MultiIndex.from_tuples(keys, names=['规格', '品名', '晶圆品名']) \
+            if keys else pd.MultiIndex.from_arrays([[], [], []])
+        self._new_values = np.array([resolved[k] for k in keys], dtype=object).reshape(-1, 3)
+
+    def _resolve(self, key, direct, resolved):
+        """沿替换链找到最终料号；遇到环时整条链记为 None（不替换）。"""
+        path = []
+        on_path = set()
+        current = key
+        while current in direct and current not in resolved:
+            if current in on_path:
+                self.cycles.append(path[path.index(current):])
+                final = None
+                break
+            path.append(current)
+            on_path.add(current)
+            current = direct[current]
+        else:
+            final = resolved.get(current, current)
+        for k in path:
+            resolved[k] = final
+        return final
+
+    def __len__(self):
+        return len(self._old_index)
+
+    def new_key_values(self):
+        """全部新料号字段的取值，供 compact_dtypes 构建共享类别表。"""
+        return pd.unique(self._new_values.ravel())
+
+    def remap(self, df, spec_col, prod_col, wafer_col, value_cols=None):
+        """
+        替换 df 中的料号字段，并把被替换的行与已持有相同新料号的行合并，数量列求和；
+        与替换无关的行原样保留（重复行交给透视求和），合并后的行排在末尾。
+        value_cols 为求和列，默认取所有数值列。
+        """
+        if len(self) == 0 or df.empty:
+            return df
+
+        keys = pd.MultiIndex.from_arrays([df[spec_col], df[prod_col], df[wafer_col]])
+        pos = self._old_index.get_indexer(keys)
+        hit = pos >= 0
+        if not hit.any():
+            return df
+
+        # 只替换三个料号列，其余列不复制
+        key_cols = [spec_col, prod_col, wafer_col]
+        df = df.assign(**{
+            col: _replace_values(df[col], hit, self._new_values[pos[hit], i])
+            for i, col in enumerate(key_cols)
+        })
+
+        if value_cols is None:
+            value_cols = df.select_dtypes(include='number').columns.tolist()
+        value_cols = [col for col in value_cols if col in df.columns]
+        group_cols = [col for col in df.columns if col not in value_cols]
+        if not value_cols or not group_cols:
+            return df
+
+        # 只有新料号所在的行需要合并：被替换的行 + 原本就是这些新料号的行
+        new_keys = pd.MultiIndex.from_arrays([df[col] for col in key_cols])
+        affected = new_keys.isin(new_keys[hit].unique())
+        merged = (
+            df[affected].groupby(group_cols, dropna=False, sort=False, observed=True)[value_cols]
+            .sum()
+            .reset_index()[list(df.columns)]
+        )
+        if len(merged) == affected.sum():
+            return df  # 没有可合并的行，不必重排整张表
+        return pd.concat([df[~affected], merged], ignore_index=True)
+
+
+def _replace_values(series, hit, new_values):
+    """
+    将 hit 位置替换为 new_values。Categorical 列在新值都属于其类别时直接改写编码，
+    保持共享字典；否则退回 object 数组。
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        new_codes = series.cat.categories.get_indexer(new_values)
+        if not ((new_codes < 0) & pd.notna(new_values)).any():
+            codes = series.cat.codes.to_numpy(copy=True)
+            codes[hit] = new_codes
+            return pd.Series(pd.Categorical.from_codes(codes, dtype=series.dtype), index=series.index)
+    values = series.to_numpy(dtype=object, copy=True)
+    values[hit] = new_values
+    return pd.Series(values, index=series.index)
+
+
+def _key_tuples(df):
+    """按行生成料号三元组，NaN 统一为 None 以便作为字典键。"""
+    return [
+        tuple(None if pd.isna(v) else v for v in row)
+        for row in df.itertuples(index=False, name=None)
+    ]
+
+
+_MAPPING_CACHE = {}
+
+
+def compile_mapping(mapping_df):
+    """
+    按料号表内容指纹缓存 MappingIndex，同一版本的料号表只编译一次。
+    """
+    if isinstance(mapping_df, MappingIndex):
+        return mapping_df
+    if mapping_df is None or mapping_df.empty:
+        return MappingIndex(None, fingerprint="empty")
+
+    fingerprint = hashlib.sha1(
+        pd.util.hash_pandas_object(mapping_df.astype(str), index=False).values
+    ).hexdigest()
+    if fingerprint not in _MAPPING_CACHE:
+        _MAPPING_CACHE.clear()
+        _MAPPING_CACHE[fingerprint] = MappingIndex(mapping_df, fingerprint)
+    return _MAPPING_CACHE[fingerprint]
+
+
+def apply_full_mapping(df, mapping_df, spec_col, prod_col, wafer_col, show_changes=True, value_cols=None):
     """
     替换料号后，立即合并新料号一致的行（即多旧料号映射到同一新料号时合并数量）。
+    mapping_df 可以是原始料号表，也可以是 compile_mapping 得到的 MappingIndex。
     """
-    # 标准列
-    full_cols = ['旧规格', '旧品名', '旧晶圆品名', '新规格', '新品名', '新晶圆品名', '封装厂', 'PC', '半成品']
-    mapping_df = mapping_df.copy()
-    mapping_df = mapping_df.iloc[:, :len(full_cols)]
-    mapping_df.columns = full_cols
-
-    df = df.copy()
-    df['_原规格'] = df[spec_col]
-    df['_原品名'] = df[prod_col]
-    df['_原晶圆'] = df[wafer_col]
-
-    # 合并料号表
-    df = df.merge(
-        mapping_df[['旧规格', '旧品名', '旧晶圆品名', '新规格', '新品名', '新晶圆品名']],
-        how='left',
-        left_on=[spec_col, prod_col, wafer_col],
-        right_on=['旧规格', '旧品名', '旧晶圆品名']
-    )
-
-    # 替换原字段
-    df[spec_col] = df['新规格'].combine_first(df[spec_col])
-    df[prod_col] = df['新品名'].combine_first(df[prod_col])
-    df[wafer_col] = df['新晶圆品名'].combine_first(df[wafer_col])
-
-    # 删除辅助列
-    df.drop(columns=[
-        '旧规格', '旧品名', '旧晶圆品名', '新规格', '新品名', '新晶圆品名',
-        '_原规格', '_原品名', '_原晶圆'
-    ], inplace=True, errors='ignore')
-
-   
-    
-    
-    return df
+    return compile_mapping(mapping_df).remap(df, spec_col, prod_col, wafer_col, value_cols=value_cols)
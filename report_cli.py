@@ -0,0 +1,134 @@
+"""
+命令行生成汇总报告（不依赖 Streamlit，可用于定时任务）。
+
+用法：
+    python report_cli.py 数据目录 --month 2025-03 [--month 2025-04 ...] [--output-dir 输出目录]
+
+数据目录中按 PIVOT_CONFIG 的文件名查找核心文件，可选的 mapping_file.xlsx 作为新旧料号表，
+safety_file.xlsx / pred_file.xlsx 作为安全库存与预测。
+"""
+import argparse
+import logging
+import os
+import sys
+
+from config import PIVOT_CONFIG, STREAM_MIN_BYTES, output_filename
+from instrumentation import NullProfiler, Profiler
+from loader import load_all
+from pipeline import build_reports
+from pivot_processor import parse_month
+from report_export import EXPORT_FORMATS, export_extension
+from reporting import LoggingReporter
+from schema_validation import validate_header
+
+MAPPING_FILE = "mapping_file.xlsx"
+REFERENCE_FILES = ["safety_file.xlsx", "pred_file.xlsx"]
+
+
+def load_directory(data_dir, reporter, profiler=None, stream_min_bytes=STREAM_MIN_BYTES):
+    """
+    并发读取目录中的核心文件、料号表与安全库存/预测文件，
+    返回 ({文件名: DataFrame}, mapping_df, {参考文件名: DataFrame})。
+    """
+    names = [name for name in list(PIVOT_CONFIG) + [MAPPING_FILE] + REFERENCE_FILES
+             if os.path.exists(os.path.join(data_dir, name))]
+    parse_jobs = {}
+    for name in names:
+        with open(os.path.join(data_dir, name), 'rb') as f:
+            data = f.read()
+        errors = validate_header(name, data)
+        for message in errors:
+            reporter.warning(f"⚠️ {message}，已跳过")
+        if not errors:
+            parse_jobs[name] = data
+
+    profiler = profiler or NullProfiler()
+    results = load_all(parse_jobs, stream_min_bytes=stream_min_bytes, track_memory=profiler.track_memory)
+    for result in results.values():
+        if result.error is not None:
+            reporter.warning(f"⚠️ 加载 {result.name} 失败：{result.error}")
+        else:
+            profiler.add("read", file=result.name, seconds=result.seconds, rows_out=len(result.df),
+                         peak_mb=result.peak_mb)
+
+    tables = {
+        name: results[name].df for name in PIVOT_CONFIG
+        if name in results and results[name].error is None
+    }
+    mapping = results.get(MAPPING_FILE)
+    mapping_df = mapping.df if mapping is not None and mapping.error is None else None
+    references = {
+        name: results[name].df for name in REFERENCE_FILES
+        if name in results and results[name].error is None
+    }
+    return tables, mapping_df, references
+
+
+def output_path(output_dir, month, export_format="xlsx"):
+    return os.path.join(output_dir, output_filename(month, export_extension(export_format)))
+
+
+def month_arg(text):
+    """argparse 的 type：截至月份解析为 pd.Period，格式错误时给出提示并退出。"""
+    try:
+        return parse_month(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成订单-在制-库存汇总报告")
+    parser.add_argument("data_dir", help="包含 PIVOT_CONFIG 中各 Excel 文件的目录")
+    parser.add_argument("--month", action="append", default=[], type=month_arg,
+                        help="截至月份（如 2025-03），可重复指定以生成多个月份的报告")
+    parser.add_argument("--output-dir", default=".", help="报告输出目录")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出处理进度")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="将各阶段耗时/行数以 JSON 写入 PATH（'-' 表示标准输出）")
+    parser.add_argument("--profile-memory", action="store_true", help="同时统计峰值内存（较慢）")
+    parser.add_argument("--snapshot-dir", metavar="DIR",
+                        help="将替换料号后的输入与透视表按月份存为 Parquet 快照")
+    parser.add_argument("--stream-min-mb", type=float, default=STREAM_MIN_BYTES / 1024 / 1024,
+                        help="不小于该大小（MB）的核心文件流式读取并预聚合，0 表示全部流式读取")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="xlsx", dest="export_format",
+                        help="xlsx 为带格式的报告；parquet / csv 输出只含数据的 zip 包，生成更快")
+    parser.add_argument("--workers", type=int, help="并行生成报告的进程数，默认取月份数与 CPU 核数的较小值")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+    reporter = LoggingReporter()
+    profiler = Profiler(track_memory=args.profile_memory) if args.profile else NullProfiler()
+
+    tables, mapping_df, references = load_directory(args.data_dir, reporter, profiler,
+                                                    stream_min_bytes=int(args.stream_min_mb * 1024 * 1024))
+    if not tables:
+        reporter.warning(f"⚠️ 目录 {args.data_dir} 中没有可处理的文件")
+        return 1
+
+    # 替换料号与透视只做一次，各月份的报告在多个进程中并行生成
+    snapshot_store = None
+    if args.snapshot_dir:
+        from snapshot_store import SnapshotStore
+        snapshot_store = SnapshotStore(args.snapshot_dir)
+    os.makedirs(args.output_dir, exist_ok=True)
+    months = list(dict.fromkeys(args.month)) or [None]
+    outputs = {month: output_path(args.output_dir, month, args.export_format) for month in months}
+    results = build_reports(tables, mapping_df, months, outputs, reporter=reporter, profiler=profiler,
+                            snapshot_store=snapshot_store, safety_df=references.get("safety_file.xlsx"),
+                            pred_df=references.get("pred_file.xlsx"), max_workers=args.workers,
+                            export_format=args.export_format)
+    # --profile - 时标准输出只保留 JSON，报告路径改写到标准错误
+    path_stream = sys.stderr if args.profile == "-" else sys.stdout
+    for path in results.values():
+        print(path, file=path_stream)
+
+    if args.profile == "-":
+        print(profiler.to_json(indent=2))
+    elif args.profile:
+        with open(args.profile, "w", encoding="utf-8") as f:
+            f.write(profiler.to_json(indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
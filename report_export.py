@@ -0,0 +1,38 @@
+"""
+只要数据、不需要格式时的导出：把报告中的各 sheet 打包为 zip，每个 sheet 一个 Parquet 或 CSV 文件。
+比带样式的 xlsx 生成快得多，下游也能直接读取。
+"""
+import zipfile
+from io import BytesIO
+
+EXPORT_FORMATS = ["xlsx", "parquet", "csv"]
+ARCHIVE_FORMATS = ["parquet", "csv"]
+
+
+def export_extension(export_format):
+    return "xlsx" if export_format == "xlsx" else "zip"
+
+
+def _sheet_bytes(df, export_format):
+    buffer = BytesIO()
+    if export_format == "parquet":
+        import pyarrow.parquet as pq
+        from snapshot_store import to_arrow
+        pq.write_table(to_arrow(df), buffer)
+    else:
+        # 带 BOM，Excel 直接打开时中文不乱码
+        df.to_csv(buffer, index=False, encoding="utf-8-sig")
+    return buffer.getvalue()
+
+
+def write_archive(sheets, output, export_format):
+    """
+    sheets 为 {sheet 名: DataFrame}；output 为文件路径或可写的二进制缓冲区。
+    Parquet 本身已压缩，zip 中只存储；CSV 用 deflate 压缩。
+    """
+    if export_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"不支持的导出格式: {export_format}")
+    compression = zipfile.ZIP_STORED if export_format == "parquet" else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(output, "w", compression=compression) as archive:
+        for name, df in sheets.items():
+            archive.writestr(f"{name}.{export_format}", _sheet_bytes(df, export_format))
@@ -0,0 +1,94 @@
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from excel_utils import compute_column_widths
+
+# 共享样式：所有单元格引用同一组对象，openpyxl 只为每种组合登记一次
+THIN = Side(border_style="thin", color="000000")
+BLACK_BORDER = Border(top=THIN, left=THIN, right=THIN, bottom=THIN)
+CENTER = Alignment(horizontal='center', vertical='center')
+HEADER_FONT = Font(bold=True)
+RED_FILL = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
+
+CHUNK_ROWS = 5000
+
+
+class StreamingReportWriter:
+    """
+    基于 openpyxl write-only 模式的报告输出：按行流式写入，内存占用不随行数增长。
+    列宽、边框、填充、合并表头都在写入前确定，并以共享样式应用。
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.workbook = Workbook(write_only=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.save()
+
+    def save(self):
+        if not self.workbook.sheetnames:
+            self.workbook.create_sheet(title="Sheet")
+        self.workbook.save(self.output)
+
+    def _cell(self, ws, value, font=None, border=None, fill=None, alignment=None):
+        cell = WriteOnlyCell(ws, value=value)
+        if font is not None:
+            cell.font = font
+        if border is not None:
+            cell.border = border
+        if fill is not None:
+            cell.fill = fill
+        if alignment is not None:
+            cell.alignment = alignment
+        return cell
+
+    def write_sheet(self, sheet_name, df, header_groups=None, border=False, highlight=None, widths=None, index=None):
+        """
+        将 DataFrame 写为一个 sheet。
+        - header_groups: [(标题, 起始列, 结束列), ...]，在列名上方加一行合并表头（列号从 1 开始）；
+        - border: 是否给表头与数据区加黑色边框；
+        - highlight: 与 df 等长的布尔序列，为 True 的行整行标红；
+        - widths: 列宽列表，默认按内容估算；
+        - index: sheet 位置，默认追加在最后。
+        """
+        ws = self.workbook.create_sheet(title=sheet_name, index=index)
+        cell_border = BLACK_BORDER if border else None
+
+        if widths is None:
+            widths = compute_column_widths(df)
+        for idx, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(idx)].width = width
+
+        if header_groups:
+            group_row = [None] * len(df.columns)
+            for title, start_col, end_col in header_groups:
+                group_row[start_col - 1] = title
+                if end_col > start_col:
+                    ws.merged_cells.add(
+                        f"{get_column_letter(start_col)}1:{get_column_letter(end_col)}1"
+                    )
+            ws.append([self._cell(ws, value, HEADER_FONT, cell_border, alignment=CENTER) for value in group_row])
+
+        ws.append([
+            self._cell(ws, str(col), HEADER_FONT, BLACK_BORDER, alignment=CENTER) for col in df.columns
+        ])
+
+        highlight = None if highlight is None else pd.Series(highlight).to_numpy(dtype=bool)
+        for start in range(0, len(df), CHUNK_ROWS):
+            chunk = df.iloc[start:start + CHUNK_ROWS]
+            values = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+            for offset, row in enumerate(values):
+                fill = RED_FILL if highlight is not None and highlight[start + offset] else None
+                if cell_border is None and fill is None:
+                    ws.append(row)
+                else:
+                    ws.append([self._cell(ws, value, border=cell_border, fill=fill) for value in row])
+        return ws
@@ -0,0 +1,35 @@
+import logging
+
+logger = logging.getLogger("semiment")
+
+
+class NullReporter:
+    """
+    报告流水线的输出接口：警告、提示、进度与中间表格展示。
+    默认实现什么都不做；Streamlit 与命令行各自提供实现。
+    """
+
+    def warning(self, message):
+        pass
+
+    def info(self, message):
+        pass
+
+    def progress(self, message):
+        pass
+
+    def show(self, obj):
+        pass
+
+
+class LoggingReporter(NullReporter):
+    """命令行使用：写入 logging，不展示中间表格。"""
+
+    def warning(self, message):
+        logger.warning(message)
+
+    def info(self, message):
+        logger.info(message)
+
+    def progress(self, message):
+        logger.info(message)
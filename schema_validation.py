@@ -0,0 +1,75 @@
+"""
+只读取表头的快速校验：在完整解析、下载或上传之前发现文件放错、字段改名等问题。
+每个文件的必需字段由 PIVOT_CONFIG / COLUMN_MAPPING 推导。
+"""
+from collections import namedtuple
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+from config import PIVOT_CONFIG, COLUMN_MAPPING
+
+# header_row: 字段名所在行（从 1 开始；预测文件第一行为汇总数字，第二行才是字段名）
+# required: 必需字段；min_columns: 最少列数（新旧料号表按位置取列）
+FileSchema = namedtuple("FileSchema", ["header_row", "required", "min_columns"])
+
+
+def _unique(cols):
+    return list(dict.fromkeys(cols))
+
+
+def _build_schemas():
+    schemas = {}
+    for filename, config in PIVOT_CONFIG.items():
+        required = list(config['index']) + [config['columns']] + list(config['values'])
+        required += list(COLUMN_MAPPING.get(filename, {}).values())
+        schemas[filename] = FileSchema(1, _unique(required), 0)
+
+    schemas["safety_file.xlsx"] = FileSchema(
+        1, _unique(list(COLUMN_MAPPING["safety_file.xlsx"].values()) + [' InvWaf', ' InvPart']), 0
+    )
+    # merge_prediction_data 将第一行数据（即 Excel 第 2 行）作为表头
+    schemas["pred_file.xlsx"] = FileSchema(
+        2, _unique(list(COLUMN_MAPPING["pred_file.xlsx"].values()) + ['合计数量', '合计金额']), 0
+    )
+    # apply_full_mapping 按位置取前 6 列：旧规格/旧品名/旧晶圆品名/新规格/新品名/新晶圆品名
+    schemas["mapping_file.xlsx"] = FileSchema(1, [], 6)
+    return schemas
+
+
+FILE_SCHEMAS = _build_schemas()
+
+
+def read_header_rows(data, n_rows):
+    """以 read-only 模式只读取第一个 sheet 的前 n_rows 行。"""
+    wb = load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        return [list(row) for row in ws.iter_rows(max_row=n_rows, values_only=True)]
+    finally:
+        wb.close()
+
+
+def validate_header(filename, data):
+    """
+    校验文件表头，返回错误信息列表（为空表示通过）。未声明 schema 的文件不校验。
+    """
+    schema = FILE_SCHEMAS.get(filename)
+    if schema is None:
+        return []
+
+    try:
+        rows = read_header_rows(data, schema.header_row)
+    except Exception as e:
+        return [f"无法读取 {filename}：{e}"]
+    if len(rows) < schema.header_row:
+        return [f"{filename} 为空或缺少表头行"]
+
+    header = [str(value) for value in rows[schema.header_row - 1] if value is not None]
+    errors = []
+    missing = [col for col in schema.required if col not in header]
+    if missing:
+        errors.append(f"{filename} 缺少字段: {', '.join(missing)}")
+    if len(rows[schema.header_row - 1]) < schema.min_columns:
+        errors.append(f"{filename} 至少需要 {schema.min_columns} 列")
+    return errors
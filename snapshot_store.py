@@ -0,0 +1,108 @@
+"""
+按月份分区的列式快照库：保存每次运行替换料号后的输入与透视结果（Parquet），
+用于跨月份对比，无需重新打开任何 Excel 文件。
+
+目录结构：
+    {root}/{kind}/month={YYYY-MM}/{数据集}.parquet
+其中 kind 为 inputs（apply_full_mapping 之后的输入）或 reports（透视表），
+数据集名为去掉扩展名的文件名（如 赛卓-未交订单）。
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import SNAPSHOT_DIR
+
+INPUTS = "inputs"
+REPORTS = "reports"
+
+
+def dataset_name(filename):
+    return filename.replace('.xlsx', '')
+
+
+def to_arrow(df):
+    """
+    转为 Arrow 表；Excel 读入的 object 列常混有数字与字符串，此时统一转为字符串。
+    """
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == object:
+                df[col] = df[col].map(lambda v: v if v is None or pd.isna(v) else str(v))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+class SnapshotStore:
+
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+
+    def _path(self, kind, month, name):
+        return os.path.join(self.root, kind, f"month={month}", f"{dataset_name(name)}.parquet")
+
+    def save(self, kind, month, name, df):
+        """写入（覆盖）某月份的一个数据集。"""
+        path = self._path(kind, month, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        pq.write_table(to_arrow(df), tmp)
+        os.replace(tmp, path)
+        return path
+
+    def months(self, kind=REPORTS, name=None):
+        """已有快照的月份列表（升序）；给定 name 时只返回包含该数据集的月份。"""
+        base = os.path.join(self.root, kind)
+        if not os.path.isdir(base):
+            return []
+        months = []
+        for entry in sorted(os.listdir(base)):
+            if not entry.startswith("month="):
+                continue
+            month = entry[len("month="):]
+            if name is None or os.path.exists(self._path(kind, month, name)):
+                months.append(month)
+        return months
+
+    def columns(self, kind, month, name):
+        """只读取 Parquet 元数据，返回列名。"""
+        return pq.read_schema(self._path(kind, month, name)).names
+
+    def load(self, kind, name, months=None, columns=None, key_col=None, keys=None):
+        """
+        读取一个数据集的若干月份，结果带 month 列。
+        - columns: 只读取这些列（列裁剪，某月份不存在的列会被跳过）；
+        - key_col / keys: 只保留 key_col 在 keys 中的行（在 Parquet 读取时过滤）。
+        文件以内存映射方式打开。
+        """
+        months = months or self.months(kind, name)
+        filters = [(key_col, "in", list(keys))] if key_col is not None and keys is not None else None
+
+        frames = []
+        for month in months:
+            path = self._path(kind, month, name)
+            if not os.path.exists(path):
+                continue
+            wanted = None
+            if columns is not None:
+                available = set(pq.read_schema(path).names)
+                wanted = [col for col in columns if col in available]
+                if key_col is not None and key_col not in wanted and key_col in available:
+                    wanted.append(key_col)
+            table = pq.read_table(path, columns=wanted, filters=filters, memory_map=True)
+            frames.append(table.to_pandas().assign(month=month))
+
+        if not frames:
+            return pd.DataFrame(columns=(columns or []) + ["month"])
+        return pd.concat(frames, ignore_index=True)
+
+    def save_run(self, month, inputs=None, reports=None):
+        """保存一次运行的全部输入与透视结果：{文件名: DataFrame}。"""
+        for name, df in (inputs or {}).items():
+            self.save(INPUTS, month, name, df)
+        for name, df in (reports or {}).items():
+            self.save(REPORTS, month, name, df)
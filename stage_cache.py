@@ -0,0 +1,62 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def fingerprint(*parts):
+    """
+    计算输入指纹：bytes 直接参与哈希，其余对象使用 repr（配置 dict、月份、上游指纹等）。
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        data = part if isinstance(part, bytes) else repr(part).encode('utf-8')
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    流水线各阶段（读取 → 替换料号 → 透视 → 月份汇总）的结果缓存，按输入指纹索引。
+    Streamlit 每次交互都会重跑脚本，模块级实例在进程内保留，未变化的文件不会重新计算。
+    缓存的 DataFrame 会被多次复用，下游不得原地修改。
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, stage, key):
+        with self._lock:
+            entry = self._entries.get((stage, key))
+            if entry is not None:
+                self._entries.move_to_end((stage, key))
+            return entry
+
+    def put(self, stage, key, value):
+        with self._lock:
+            self._entries[(stage, key)] = value
+            self._entries.move_to_end((stage, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, stage, key, compute):
+        """命中则直接返回缓存结果，否则调用 compute() 并缓存。"""
+        value = self.get(stage, key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        self.put(stage, key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+default_stage_cache = StageCache()
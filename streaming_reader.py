@@ -0,0 +1,99 @@
+"""
+大文件的流式读取：用 openpyxl read-only 模式逐行读取，只保留透视需要的列，
+按块预聚合后再交给透视流程，内存占用取决于 料号×月份 的组合数而不是原始行数。
+
+预聚合结果与原始明细的结构相同（同样的列名），日期列被截断为所在月份的第一天，
+因此后续的替换料号、日期处理与透视都无需改动，求和结果与逐行处理一致。
+"""
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from config import PIVOT_CONFIG, COLUMN_MAPPING
+from excel_utils import normalize_dates
+
+CHUNK_ROWS = 50_000
+
+
+def projected_columns(filename):
+    """透视与替换料号用到的列：index + columns + values + COLUMN_MAPPING 中的料号列。"""
+    config = PIVOT_CONFIG[filename]
+    cols = list(config['index']) + [config['columns']] + list(config['values'])
+    cols += list(COLUMN_MAPPING.get(filename, {}).values())
+    return list(dict.fromkeys(cols))
+
+
+def iter_excel_chunks(data, columns, chunk_rows=CHUNK_ROWS):
+    """
+    逐块读取第一个 sheet（第一行为表头），每块为只含 columns 中已存在列的 DataFrame。
+    """
+    wb = load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        positions = {}
+        for i, name in enumerate(header):
+            if name is not None and str(name) in columns:
+                positions.setdefault(str(name), i)
+        names = [col for col in columns if col in positions]
+        idx = [positions[col] for col in names]
+
+        chunk = []
+        for row in rows:
+            chunk.append([row[i] if i < len(row) else None for i in idx])
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame(chunk, columns=names)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=names)
+    finally:
+        wb.close()
+
+
+def _reduce(df, keys, values):
+    return df.groupby(keys, dropna=False, sort=False, observed=True)[values].sum().reset_index()
+
+
+def read_aggregated(data, filename, chunk_rows=CHUNK_ROWS, max_partial_rows=None):
+    """
+    流式读取 PIVOT_CONFIG 中的文件并按 (非数值列) 预聚合，返回与 pd.read_excel 列名一致的 DataFrame。
+    数值列转为数字（无法解析的值按缺失处理），日期列截断到月初。
+    累积的部分聚合超过 max_partial_rows（默认 4 个块）时再合并一次，避免中间结果随行数增长。
+    """
+    config = PIVOT_CONFIG[filename]
+    columns = projected_columns(filename)
+    max_partial_rows = max_partial_rows or 4 * chunk_rows
+    date_col = config['columns'] if 'date_format' in config else None
+
+    partials, partial_rows = [], 0
+    names = []
+    for chunk in iter_excel_chunks(data, columns, chunk_rows):
+        names = list(chunk.columns)
+        values = [col for col in config['values'] if col in chunk.columns]
+        keys = [col for col in names if col not in values]
+        for col in values:
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+        if date_col in chunk.columns:
+            chunk[date_col] = normalize_dates(chunk[date_col]).dt.to_period('M').dt.to_timestamp()
+        if not keys or not values:
+            partials.append(chunk)
+            continue
+
+        partial = _reduce(chunk, keys, values)
+        partials.append(partial)
+        partial_rows += len(partial)
+        if partial_rows > max_partial_rows and len(partials) > 1:
+            partials = [_reduce(pd.concat(partials, ignore_index=True), keys, values)]
+            partial_rows = len(partials[0])
+
+    if not partials:
+        return pd.DataFrame(columns=names)
+    result = pd.concat(partials, ignore_index=True)
+    values = [col for col in config['values'] if col in result.columns]
+    keys = [col for col in result.columns if col not in values]
+    if keys and values:
+        result = _reduce(result, keys, values)
+    return result[names]
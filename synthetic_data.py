@@ -0,0 +1,191 @@
+"""
+生成结构与真实文件一致的合成数据，用于性能测试。
+
+覆盖 PIVOT_CONFIG 中的 5 个核心文件以及新旧料号、安全库存、预测三个参考文件，
+规模可配置（如 1k ~ 1M 行、100 ~ 50k 个料号）。用法：
+    python synthetic_data.py 输出目录 --rows 100000 --skus 5000
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+WAREHOUSES = ["成品仓", "待检仓", "外协仓", "不良品仓"]
+WORK_CENTERS = ["封装", "测试", "编带", "外协"]
+PACKAGES = ["SOT23-6L", "SOT-23", "TS-2", "DFN2X2", "SOP-8"]
+FACTORIES = ["南通宁芯", "浙江赛扬", "佛山蓝箭"]
+
+
+def make_skus(n_skus):
+    """生成 (晶圆品名, 规格, 品名) 料号三元组。"""
+    ids = np.arange(n_skus)
+    return pd.DataFrame({
+        "晶圆品名": [f"STC{i // 4:05d}A" for i in ids],
+        "规格": [f"SC{i:05d}VB-BK" for i in ids],
+        "品名": [f"SC{i:05d}VB-CA-00AK-{i}" for i in ids],
+    })
+
+
+def _month_starts(start_month, n_months):
+    return pd.period_range(start_month, periods=n_months, freq="M").to_timestamp()
+
+
+def _sample(rng, skus, n_rows):
+    return skus.iloc[rng.integers(0, len(skus), n_rows)].reset_index(drop=True)
+
+
+def _random_dates(rng, start_month, n_months, n_rows):
+    start = pd.Timestamp(pd.Period(start_month, freq="M").start_time)
+    days = rng.integers(0, n_months * 30, n_rows)
+    return start + pd.to_timedelta(days, unit="D")
+
+
+def make_mapping(skus, rng, mapped_ratio=0.05, chain_ratio=0.2):
+    """
+    新旧料号表：部分料号有新料号，其中一部分为多级替换（旧 → 中 → 新）。
+    与真实文件一样带两行表头（第一行 旧/新，第二行为字段名）。
+    """
+    n_mapped = max(1, int(len(skus) * mapped_ratio))
+    old = skus.iloc[rng.choice(len(skus), n_mapped, replace=False)].reset_index(drop=True)
+    new = old.assign(规格=old["规格"] + "-N", 品名=old["品名"] + "-N")
+
+    n_chain = int(n_mapped * chain_ratio)
+    final = new.iloc[:n_chain].assign(品名=new["品名"].iloc[:n_chain] + "2")
+
+    rows = pd.concat([
+        pd.concat([old[["规格", "品名", "晶圆品名"]], new[["规格", "品名", "晶圆品名"]]], axis=1),
+        pd.concat([new.iloc[:n_chain][["规格", "品名", "晶圆品名"]].reset_index(drop=True),
+                   final[["规格", "品名", "晶圆品名"]].reset_index(drop=True)], axis=1),
+    ], ignore_index=True)
+    rows.columns = range(6)
+    rows[6] = rng.choice(FACTORIES, len(rows))
+    rows[7] = "PC"
+    rows[8] = np.nan
+
+    header = pd.DataFrame([["规格", "品名", "晶圆品名", "规格", "品名", "晶圆品名", "封装厂", "PC", "半成品"]])
+    mapping = pd.concat([header, rows], ignore_index=True)
+    mapping.columns = ["旧", "Unnamed: 1", "Unnamed: 2", "新", "Unnamed: 4", "Unnamed: 5",
+                       "Unnamed: 6", "Unnamed: 7", "Unnamed: 8"]
+    return mapping
+
+
+def make_safety(skus, rng, start_month="2024-01", n_months=15):
+    """安全库存：每个料号一行，含 InvWaf / InvPart 与各月用量。"""
+    n = len(skus)
+    df = pd.DataFrame({
+        "WaferID": skus["晶圆品名"],
+        "PartNumber": [f"KH{i}" for i in range(n)],
+        "OrderInformation": skus["规格"],
+        "Mark": [f"{i}" for i in range(n)],
+        "ProductionNO.": skus["品名"],
+        " InvWaf": np.where(rng.random(n) < 0.5, np.nan, 100.0),
+        " InvPart": rng.integers(1, 30, n) * 100000.0,
+        "备注": np.nan,
+    })
+    months = rng.integers(0, 3_000_000, (n, n_months)).astype(float)
+    for i, month in enumerate(_month_starts(start_month, n_months)):
+        df[month.to_pydatetime()] = months[:, i]
+    df["合计"] = months.sum(axis=1)
+    return df
+
+
+def make_prediction(skus, rng, n_months=8):
+    """预测：与真实文件一样第一行为汇总数字表头，第二行才是字段名。"""
+    n = len(skus)
+    qty = rng.integers(0, 10_000_000, (n, n_months))
+    header = ["产品型号", "ProductionNO.", "晶圆品名", "封装类型", "封装厂", "档位"] + \
+        [f"{m}月预测" for m in range(5, 5 + n_months)] + ["合计数量", "合计金额"]
+    body = pd.DataFrame({
+        0: skus["规格"], 1: skus["品名"], 2: skus["晶圆品名"],
+        3: rng.choice(PACKAGES, n), 4: rng.choice(FACTORIES, n), 5: np.nan,
+    })
+    for i in range(n_months):
+        body[6 + i] = qty[:, i]
+    body[6 + n_months] = qty.sum(axis=1)
+    body[7 + n_months] = (qty.sum(axis=1) * rng.random(n)).round(2)
+    df = pd.concat([pd.DataFrame([header]), body], ignore_index=True).astype(object)
+    df.columns = [f"Unnamed: {i}" for i in range(6)] + list(df.iloc[1:, 6:].sum().astype(float))
+    return df
+
+
+def generate_inputs(n_rows=10_000, n_skus=1_000, seed=0, start_month="2025-01", n_months=12):
+    """
+    生成全部输入，返回 {文件名: DataFrame}（与 pd.read_excel 读入后的结构一致）。
+    核心文件各 n_rows 行，料号从 n_skus 个中抽样（含会被新旧料号表替换的旧料号）。
+    """
+    rng = np.random.default_rng(seed)
+    skus = make_skus(n_skus)
+
+    orders = _sample(rng, skus, n_rows)
+    orders["预交货日"] = _random_dates(rng, start_month, n_months, n_rows)
+    orders["订单数量"] = rng.integers(1, 100_000, n_rows)
+    orders["未交订单数量"] = (orders["订单数量"] * rng.random(n_rows)).astype("int64")
+
+    wip = _sample(rng, skus, n_rows)
+    finished_wip = pd.DataFrame({
+        "工作中心": rng.choice(WORK_CENTERS, n_rows),
+        "封装形式": rng.choice(PACKAGES, n_rows),
+        "晶圆型号": wip["晶圆品名"],
+        "产品规格": wip["规格"],
+        "产品品名": wip["品名"],
+        "预计完工日期": _random_dates(rng, start_month, n_months, n_rows),
+        "未交": rng.integers(1, 50_000, n_rows),
+    })
+
+    cp = _sample(rng, skus, n_rows)
+    cp_wip = pd.DataFrame({
+        "晶圆型号": cp["晶圆品名"],
+        "产品品名": cp["品名"],
+        "预计完工日期": _random_dates(rng, start_month, n_months, n_rows),
+        "未交": rng.integers(1, 50_000, n_rows),
+    })
+
+    stock = _sample(rng, skus, n_rows)
+    finished_stock = pd.DataFrame({
+        "WAFER品名": stock["晶圆品名"],
+        "规格": stock["规格"],
+        "品名": stock["品名"],
+        "仓库名称": rng.choice(WAREHOUSES, n_rows),
+        "数量": rng.integers(0, 100_000, n_rows),
+    })
+
+    wafer = _sample(rng, skus, n_rows)
+    wafer_stock = pd.DataFrame({
+        "WAFER品名": wafer["晶圆品名"],
+        "规格": wafer["规格"],
+        "仓库名称": rng.choice(WAREHOUSES, n_rows),
+        "数量": rng.integers(0, 500, n_rows),
+    })
+
+    return {
+        "赛卓-未交订单.xlsx": orders,
+        "赛卓-成品在制.xlsx": finished_wip,
+        "赛卓-CP在制.xlsx": cp_wip,
+        "赛卓-成品库存.xlsx": finished_stock,
+        "赛卓-晶圆库存.xlsx": wafer_stock,
+        "mapping_file.xlsx": make_mapping(skus, rng),
+        "safety_file.xlsx": make_safety(skus, rng),
+        "pred_file.xlsx": make_prediction(skus, rng),
+    }
+
+
+def write_inputs(directory, inputs):
+    """将生成的数据写成 Excel 文件（大规模时较慢，仅在需要真实文件时使用）。"""
+    os.makedirs(directory, exist_ok=True)
+    for filename, df in inputs.items():
+        df.to_excel(os.path.join(directory, filename), index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成测试数据")
+    parser.add_argument("output_dir")
+    parser.add_argument("--rows", type=int, default=10_000, help="每个核心文件的行数")
+    parser.add_argument("--skus", type=int, default=1_000, help="料号数量")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_inputs(args.output_dir, generate_inputs(args.rows, args.skus, args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 import streamlit as st
-from config import CONFIG
+from reporting import NullReporter
 
 
 def setup_sidebar():
@@ -11,14 +11,78 @@ def setup_sidebar():
 
 
 def get_user_inputs():
+    """
+    返回 (核心文件, 预测文件, 安全库存文件, 新旧料号文件, 截至月份, 月份是否有效)。
+    上传控件总是全部渲染（未渲染的控件会丢失已上传的文件），月份无效时只在输入框下方提示，
+    由调用方阻止生成报告。
+    """
     st.title('Excel 数据处理与汇总工具')
-    selected_month = st.text_input('📅 请输入截至月份（如 2025-03，可选）')
-    CONFIG['selected_month'] = selected_month if selected_month else None
+    selected_month = st.text_input('📅 请输入截至月份（如 2025-03，可选）').strip() or None
+    month_error = st.empty()
 
     uploaded_files = st.file_uploader('📂 上传 5 个核心 Excel 文件（订单/库存/在制）', type=['xlsx'], accept_multiple_files=True)
     pred_file = st.file_uploader('📈 上传预测文件', type=['xlsx'], key='pred_file')
     safety_file = st.file_uploader('🔐 上传安全库存文件', type=['xlsx'], key='safety_file')
     mapping_file = st.file_uploader('🔁 上传新旧料号对照表', type=['xlsx'], key='mapping_file')
 
-    return uploaded_files, pred_file, safety_file, mapping_file
+    month_ok = True
+    if selected_month:
+        # 透视模块依赖 pandas，只在填写了月份时才导入
+        from pivot_processor import parse_month
+        try:
+            selected_month = parse_month(selected_month)
+        except ValueError as e:
+            month_error.error(f"❌ {e}")
+            selected_month, month_ok = None, False
 
+    return uploaded_files, pred_file, safety_file, mapping_file, selected_month, month_ok
+
+
+def get_profile_options():
+    """侧边栏的性能统计开关：(是否显示, 是否统计内存)。"""
+    with st.sidebar:
+        show = st.checkbox('⏱️ 显示各阶段耗时')
+        track_memory = st.checkbox('统计峰值内存（较慢）', disabled=not show)
+    return show, show and track_memory
+
+
+EXPORT_LABELS = {
+    "xlsx": "Excel 报告（带格式）",
+    "parquet": "Parquet 数据包（zip，仅数据）",
+    "csv": "CSV 数据包（zip，仅数据）",
+}
+
+MIME_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "zip": "application/zip",
+}
+
+
+def get_export_format():
+    """输出格式：xlsx 报告或 Parquet/CSV 数据包。"""
+    return st.radio('📦 输出格式', list(EXPORT_LABELS), format_func=EXPORT_LABELS.get, horizontal=True)
+
+
+def render_profile(profiler):
+    """展示各阶段、各文件的耗时、行数与峰值内存。"""
+    with st.expander('⏱️ 各阶段耗时', expanded=True):
+        df = profiler.to_frame()
+        st.dataframe(df, use_container_width=True)
+        st.dataframe(df.groupby('stage', sort=False)['seconds'].sum().rename('合计秒数'))
+
+
+
+class StreamlitReporter(NullReporter):
+    """在页面上展示流水线的警告、提示与中间表格。"""
+
+    def warning(self, message):
+        st.warning(message)
+
+    def info(self, message):
+        st.info(message)
+
+    def progress(self, message):
+        st.write(message)
+
+    def show(self, obj):
+        st.write(obj)